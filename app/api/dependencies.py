@@ -0,0 +1,70 @@
+import asyncio
+import math
+
+from fastapi import HTTPException, Request
+
+from app.config.settings import REQUEST_TIMEOUT_HEADER, MAX_REQUEST_TIMEOUT, DISCONNECT_POLL_INTERVAL, CLIENT_KEY_HEADER
+from app.utils.admission import api_key_client, host_client
+from app.utils.deadline import Deadline, DeadlineExceeded
+from app.utils.stats import Stats
+
+async def _watch_disconnect(request: Request, deadline: Deadline):
+    """
+    Cancels the deadline as soon as the client disconnects.
+    """
+    while not deadline.expired:
+        if await request.is_disconnected():
+            deadline.cancel('disconnected')
+            return
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+def request_deadline(default_timeout: float):
+    """
+    Builds a dependency providing the deadline of a request.
+
+    The timeout is read from the `REQUEST_TIMEOUT_HEADER` header in seconds, falling back to the route's
+    default and capped by `MAX_REQUEST_TIMEOUT`. While the request runs, the client connection is watched
+    and the deadline is cancelled if the client goes away.
+
+    Parameters:
+    ----------
+    default_timeout : float
+        Timeout in seconds used when the request carries no timeout header.
+    """
+    async def dependency(request: Request):
+        timeout = default_timeout
+        header = request.headers.get(REQUEST_TIMEOUT_HEADER)
+        if header is not None:
+            try:
+                timeout = float(header)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid {REQUEST_TIMEOUT_HEADER} header: {header}")
+            if not math.isfinite(timeout) or timeout <= 0:
+                raise HTTPException(status_code=400, detail=f"{REQUEST_TIMEOUT_HEADER} must be a positive number of seconds")
+        deadline = Deadline(min(timeout, MAX_REQUEST_TIMEOUT))
+
+        watcher = asyncio.create_task(_watch_disconnect(request, deadline))
+        try:
+            yield deadline
+        finally:
+            watcher.cancel()
+    return dependency
+
+def client_key(request: Request) -> str:
+    """
+    Identifies the client of a request for fair scheduling: its API key, or its address when it sends none.
+    The two are kept in separate namespaces, so an API key never shares the queue of an address.
+    """
+    api_key = request.headers.get(CLIENT_KEY_HEADER)
+    if api_key:
+        return api_key_client(api_key)
+    return host_client(request.client.host if request.client else 'unknown')
+
+def abandoned(service: str, error: DeadlineExceeded) -> HTTPException:
+    """
+    Counts abandoned work of a service and returns the HTTP error reported for it.
+    """
+    Stats.increment(f"cancelled.{service}.{error.reason}")
+    if error.reason == 'timeout':
+        return HTTPException(status_code=504, detail="Request deadline exceeded")
+    return HTTPException(status_code=499, detail="Client closed request")
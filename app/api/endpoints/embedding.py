@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.dependencies import request_deadline, abandoned, client_key
+from app.config.settings import EMBED_TIMEOUT
+from app.services.index import get_embedding_service, get_intent_scheduler
+from app.schemas import EmbeddingSchema, EmbeddingResponse
+from app.utils.admission import AdmissionRejected, intent_request_cost
+from app.utils.deadline import DeadlineExceeded
+
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+BINARY_MEDIA_TYPES = {
+    'npy': 'application/x-npy',
+    'raw': 'application/octet-stream',
+}
+
+@router.post("/embed", response_model=EmbeddingResponse)
+async def embed(text: EmbeddingSchema, embedding_service = Depends(get_embedding_service), scheduler = Depends(get_intent_scheduler),
+          client = Depends(client_key), deadline = Depends(request_deadline(EMBED_TIMEOUT))):
+    """
+    Endpoint for sentence embeddings.
+
+    This endpoint embeds a list of texts with the encoder of the intent classification service, sharing its
+    embedding cache and its fair scheduler. The vectors can be returned as JSON or, to avoid converting floats
+    to text, as a binary NumPy `.npy` file or raw array buffer.
+
+    Parameters:
+    ----------
+    text : EmbeddingSchema
+        The texts to embed and the requested dtype, format and normalization.
+    embedding_service : EmbeddingService
+        The embedding service dependency.
+    scheduler : IntentScheduler
+        The fair scheduler shared with intent classification.
+    client : str
+        Key identifying the client for fair scheduling.
+    deadline : Deadline
+        Deadline of the request, taken from the `X-Request-Timeout` header or `EMBED_TIMEOUT`.
+
+    Returns:
+    -------
+    dict or Response
+        For the 'json' format, the dimension, dtype and vectors. For the binary formats, the serialized array
+        with its shape and dtype in the `X-Embedding-Shape` and `X-Embedding-Dtype` headers.
+
+    Raises:
+    ------
+    HTTPException:
+        With the same status codes as `/intent-classification`.
+
+    Example:
+    --------
+    Request body:
+    {
+        "texts": ["برای من یک کشک بادمجون سفارش بده", "ساعت چنده؟"],
+        "dtype": "float16",
+        "format": "npy"
+    }
+    """
+    try:
+        cost = intent_request_cost(text.texts)
+        async with scheduler.admit(client, cost, deadline):
+            vectors = await run_in_threadpool(embedding_service.embed, text.texts, dtype=text.dtype, normalize=text.normalize, deadline=deadline)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except DeadlineExceeded as e:
+        raise abandoned('embed', e)
+    except Exception as e:
+        logger.error(f"An error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    if text.format == 'json':
+        return {'dim': vectors.shape[1], 'dtype': text.dtype, 'embeddings': vectors.tolist()}
+
+    content = embedding_service.to_npy(vectors) if text.format == 'npy' else vectors.tobytes(order='C')
+    headers = {
+        'X-Embedding-Shape': f"{vectors.shape[0]},{vectors.shape[1]}",
+        'X-Embedding-Dtype': text.dtype,
+    }
+    return Response(content=content, media_type=BINARY_MEDIA_TYPES[text.format], headers=headers)
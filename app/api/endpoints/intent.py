@@ -1,38 +1,71 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 
-from app.services.index import get_intent_service
-from app.schemas import IntentSchema
+from app.api.dependencies import request_deadline, abandoned, client_key
+from app.config.settings import INTENT_TIMEOUT
+from app.services.index import get_intent_service, get_intent_scheduler
+from app.schemas import IntentSchema, IntentBatchSchema, IntentResponse, IntentBatchResponse
+from app.services.intent_index import EmptyIntentIndex
+from app.utils.admission import AdmissionRejected, intent_request_cost
+from app.utils.deadline import DeadlineExceeded
 
-from typing import Any
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/intent-classification", response_model=Any)
-def intent_classification(text: IntentSchema, intent_service = Depends(get_intent_service)):
+def _persisted_index(intent_service, name):
+    """
+    Returns the named intent set, or None for requests sending their own training data.
+    """
+    if name is None:
+        return None
+    try:
+        return intent_service.get_index(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown intent set: {name}")
+
+@router.post("/intent-classification", response_model=IntentResponse)
+async def intent_classification(text: IntentSchema, intent_service = Depends(get_intent_service), scheduler = Depends(get_intent_scheduler),
+                          client = Depends(client_key), deadline = Depends(request_deadline(INTENT_TIMEOUT))):
     """
     Endpoint for intent classification.
 
     This endpoint receives a query and training data, processes them using the intent classification service,
-    and returns the classified intent.
+    and returns the classified intent. Instead of sending the training data, a request may name a persisted
+    intent set with `intent_set`, whose precomputed embeddings are used.
+
+    Before any model work, the cost of the request is estimated from the number of tokens it has to embed.
+    Oversized payloads are rejected, and admitted requests wait for a slot of the fair scheduler, which
+    shares the service between clients (identified by the `X-API-Key` header) in proportion to their weights.
+    Requests wait on the event loop; the model work only moves to the threadpool once a slot is granted, so
+    queued requests never hold the worker threads other routes need.
 
     Parameters:
     ----------
     text : IntentSchema
-        The input data containing the query and training data.
+        The input data containing the query and either training data or the name of a persisted intent set.
     intent_service : IntentService
         The intent classification service dependency.
+    scheduler : IntentScheduler
+        The fair scheduler admitting intent classification requests.
+    client : str
+        Key identifying the client for fair scheduling.
+    deadline : Deadline
+        Deadline of the request, taken from the `X-Request-Timeout` header or `INTENT_TIMEOUT`.
 
     Returns:
     -------
     dict
-        The classification results, including indices, values of the nearest neighbors, and the majority class.
+        The classification results, including indices, values of the nearest neighbors, the majority class and
+        its label.
 
     Raises:
     ------
     HTTPException:
-        If an internal server error occurs during intent classification.
+        If the payload exceeds the configured limits (413), the client's queue (429) or the service queue (503)
+        is full, the named intent set does not exist (404) or has no examples (422), the deadline passes (504), the client disconnects (499)
+        or an internal server error occurs during intent classification.
 
     Example:
     --------
@@ -53,14 +86,96 @@ def intent_classification(text: IntentSchema, intent_service = Depends(get_inten
     {
         "Indices": [0, 1, 2],
         "Values": [0.2, 0.5, 0.7],
-        "Majority Class": 0
+        "Majority Class": 0,
+        "Label": "رزرو غذا"
     }
     """
+    index = await run_in_threadpool(_persisted_index, intent_service, text.intent_set)
     try:
         query = text.query
-        data = text.data
-        entities = intent_service.intent_classifier(data, query)
-        return entities
+        cost = intent_request_cost([query], text.data)
+        async with scheduler.admit(client, cost, deadline):
+            if index is not None:
+                results = await run_in_threadpool(intent_service.classify_batch, index, [query], deadline=deadline)
+                return results[0]
+            data = text.data
+            entities = await run_in_threadpool(intent_service.intent_classifier, data, query, deadline=deadline)
+            return entities
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except EmptyIntentIndex as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except DeadlineExceeded as e:
+        raise abandoned('intent', e)
+    except Exception as e:
+        logger.error(f"An error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/intent-classification/batch", response_model=IntentBatchResponse)
+async def intent_classification_batch(text: IntentBatchSchema, intent_service = Depends(get_intent_service), scheduler = Depends(get_intent_scheduler),
+                                client = Depends(client_key), deadline = Depends(request_deadline(INTENT_TIMEOUT))):
+    """
+    Endpoint for classifying several queries against one intent set in a single call.
+
+    The training data (or the persisted intent set) is embedded once, all queries are embedded together and
+    their nearest neighbors are found with a single queries x examples distance computation, so every
+    additional query costs roughly one forward pass.
+
+    Parameters:
+    ----------
+    text : IntentBatchSchema
+        The queries, either training data or the name of a persisted intent set, and the number of neighbors `k`.
+    intent_service : IntentService
+        The intent classification service dependency.
+    scheduler : IntentScheduler
+        The fair scheduler admitting intent classification requests.
+    client : str
+        Key identifying the client for fair scheduling.
+    deadline : Deadline
+        Deadline of the request, taken from the `X-Request-Timeout` header or `INTENT_TIMEOUT`.
+
+    Returns:
+    -------
+    dict
+        The classification results of every query, in the order of `queries`.
+
+    Raises:
+    ------
+    HTTPException:
+        With the same status codes as `/intent-classification`.
+
+    Example:
+    --------
+    Request body:
+    {
+        "queries": ["برای من یک کشک بادمجون سفارش بده", "ساعت چنده؟"],
+        "intent_set": "food_bot",
+        "k": 3
+    }
+
+    Response:
+    {
+        "results": [
+            {"Indices": [0, 0, 1], "Values": [0.2, 0.5, 0.7], "Majority Class": 0, "Label": "رزرو غذا"},
+            {"Indices": [2, 2, 2], "Values": [0.1, 0.3, 0.4], "Majority Class": 2, "Label": "پرسیدن ساعت"}
+        ]
+    }
+    """
+    index = await run_in_threadpool(_persisted_index, intent_service, text.intent_set)
+    try:
+        cost = intent_request_cost(text.queries, text.data)
+        async with scheduler.admit(client, cost, deadline):
+            if index is not None:
+                results = await run_in_threadpool(intent_service.classify_batch, index, text.queries, k=text.k, deadline=deadline)
+            else:
+                results = await run_in_threadpool(intent_service.intent_classifier_batch, text.data, text.queries, k=text.k, deadline=deadline)
+            return {'results': results}
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except EmptyIntentIndex as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except DeadlineExceeded as e:
+        raise abandoned('intent', e)
     except Exception as e:
         logger.error(f"An error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
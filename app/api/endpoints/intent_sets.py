@@ -0,0 +1,129 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.dependencies import client_key
+from app.services.index import get_intent_service, get_intent_scheduler
+from app.schemas import IntentSetSchema, IntentExamplesSchema, IntentLabelSchema
+from app.utils.admission import AdmissionRejected, intent_request_cost
+
+from typing import Any
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+def _summary(name, index):
+    counts = {label: 0 for label in index.labels}
+    for label_index in index.example_labels.tolist():
+        counts[index.labels[label_index]] += 1
+    return {'name': name, 'labels': counts, 'examples': len(index)}
+
+async def _run_admitted(scheduler, client, data, name, operation):
+    """
+    Runs an operation embedding the sentences of `data` in the threadpool once the fair scheduler admits it.
+    """
+    try:
+        cost = intent_request_cost([], data)
+        async with scheduler.admit(client, cost):
+            return await run_in_threadpool(_run, name, operation)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+def _run(name, operation):
+    """
+    Runs an intent set operation and maps service errors to HTTP errors.
+    """
+    try:
+        return _summary(name, operation())
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Not found: {e.args[0]}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"An error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/intent-sets", response_model=Any)
+def list_intent_sets(intent_service = Depends(get_intent_service)):
+    """
+    Lists the persisted intent sets with the number of examples per label.
+    """
+    return [_summary(name, index) for name, index in intent_service.list_indexes().items()]
+
+@router.get("/intent-sets/{name}", response_model=Any)
+def get_intent_set(name: str, intent_service = Depends(get_intent_service)):
+    """
+    Returns the labels and example sentences of a persisted intent set.
+    """
+    try:
+        return intent_service.get_index(name).to_data()
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Not found: {name}")
+
+@router.put("/intent-sets/{name}", response_model=Any)
+async def put_intent_set(name: str, body: IntentSetSchema, intent_service = Depends(get_intent_service),
+                   scheduler = Depends(get_intent_scheduler), client = Depends(client_key)):
+    """
+    Creates or replaces a persisted intent set.
+
+    Example:
+    --------
+    Request body:
+    {
+        "data": {
+            "رزرو غذا": ["یک پیتزا با پپرونی و قارچ بساز .", ...],
+            ...
+        }
+    }
+
+    Response:
+    {
+        "name": "food_bot",
+        "labels": {"رزرو غذا": 12, ...},
+        "examples": 40
+    }
+    """
+    return await _run_admitted(scheduler, client, body.data, name, lambda: intent_service.create_intent_set(name, body.data))
+
+@router.delete("/intent-sets/{name}", response_model=Any)
+def delete_intent_set(name: str, intent_service = Depends(get_intent_service)):
+    """
+    Deletes a persisted intent set.
+    """
+    try:
+        intent_service.delete_intent_set(name)
+        return {'name': name, 'deleted': True}
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Not found: {name}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/intent-sets/{name}/examples", response_model=Any)
+async def add_examples(name: str, body: IntentExamplesSchema, intent_service = Depends(get_intent_service),
+                 scheduler = Depends(get_intent_scheduler), client = Depends(client_key)):
+    """
+    Adds example sentences to a label, creating the label if needed. Only the new sentences are embedded.
+    """
+    data = {body.label: body.sentences}
+    return await _run_admitted(scheduler, client, data, name, lambda: intent_service.add_examples(name, body.label, body.sentences))
+
+@router.delete("/intent-sets/{name}/examples", response_model=Any)
+def remove_examples(name: str, body: IntentExamplesSchema, intent_service = Depends(get_intent_service)):
+    """
+    Removes example sentences from a label.
+    """
+    return _run(name, lambda: intent_service.remove_examples(name, body.label, body.sentences))
+
+@router.patch("/intent-sets/{name}/labels/{label}", response_model=Any)
+def rename_label(name: str, label: str, body: IntentLabelSchema, intent_service = Depends(get_intent_service)):
+    """
+    Renames a label. No example is embedded again.
+    """
+    return _run(name, lambda: intent_service.rename_label(name, label, body.new_label))
+
+@router.delete("/intent-sets/{name}/labels/{label}", response_model=Any)
+def remove_label(name: str, label: str, intent_service = Depends(get_intent_service)):
+    """
+    Removes a label and all of its examples.
+    """
+    return _run(name, lambda: intent_service.remove_label(name, label))
@@ -1,20 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException
 
+from app.api.dependencies import request_deadline, abandoned
+from app.config.settings import NER_TIMEOUT
 from app.services.index import get_ner_service
-from app.schemas import NERSchema
+from app.schemas import NERSchema, NERResponse
+from app.utils.deadline import DeadlineExceeded
 
-from typing import Any
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/extract-entities", response_model=Any)
-def extract_entities(text: NERSchema, ner_service = Depends(get_ner_service)):
+@router.post("/extract-entities", response_model=NERResponse)
+def extract_entities(text: NERSchema, ner_service = Depends(get_ner_service), deadline = Depends(request_deadline(NER_TIMEOUT))):
     try:
         query = text.query
-        entities = ner_service.get_full_entity_names(query)
+        entities = ner_service.get_full_entity_names(query, deadline=deadline)
         return entities
+    except DeadlineExceeded as e:
+        raise abandoned('ner', e)
     except Exception as e:
         logger.error(f"An error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
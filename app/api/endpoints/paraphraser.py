@@ -1,22 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException
 
+from app.api.dependencies import request_deadline, abandoned
+from app.config.settings import PARAPHRASE_TIMEOUT
 from app.services.index import get_paraphrase_service
-from app.schemas import ParaphraserSchema
+from app.schemas import ParaphraserSchema, ParaphraseResponse
+from app.utils.deadline import DeadlineExceeded
 
-from typing import Any
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/paraphrase", response_model=Any)
-def paraphrase(text: ParaphraserSchema, service = Depends(get_paraphrase_service)):
+@router.post("/paraphrase", response_model=ParaphraseResponse)
+def paraphrase(text: ParaphraserSchema, service = Depends(get_paraphrase_service), deadline = Depends(request_deadline(PARAPHRASE_TIMEOUT))):
     try:
         query = text.query
-        paraphrased = service.paraphrase(query)
+        paraphrased = service.paraphrase(query, deadline=deadline)
         return {
             'result': paraphrased
         }
+    except DeadlineExceeded as e:
+        raise abandoned('paraphrase', e)
     except Exception as e:
         logger.error(f"An error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
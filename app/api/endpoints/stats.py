@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+
+from app.utils.stats import Stats
+
+from typing import Any
+
+router = APIRouter()
+
+@router.get("/stats", response_model=Any)
+def stats():
+    """
+    Returns the service counters, such as the number of requests abandoned per service and reason, and timings,
+    such as the forward pass latency of every encoder length bucket.
+    """
+    return Stats.snapshot()
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .endpoints import ner, paraphraser, intent
+from .endpoints import ner, paraphraser, intent, intent_sets, embedding, stats
 
 api_router = APIRouter()
 
@@ -7,3 +7,6 @@ api_router = APIRouter()
 api_router.include_router(ner.router, tags=["NER"])
 api_router.include_router(paraphraser.router, tags=["Paraphraser"])
 api_router.include_router(intent.router, tags=['Intent Classification'])
+api_router.include_router(intent_sets.router, tags=['Intent Sets'])
+api_router.include_router(embedding.router, tags=['Embedding'])
+api_router.include_router(stats.router, tags=['Monitoring'])
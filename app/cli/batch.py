@@ -0,0 +1,397 @@
+'''
+    Offline batch runner for corpus-scale NER, paraphrasing and intent classification.
+
+    The runner calls the services directly instead of going through the HTTP API. The input is read in
+    streaming chunks, every chunk is processed by a worker process and written to its own output shard,
+    and a checkpoint file records finished chunks so an interrupted job resumes where it stopped.
+
+    Usage:
+        python -m app.cli.batch ner corpus.jsonl out/ner --workers 4 --threads 2
+        python -m app.cli.batch paraphrase corpus.csv out/paraphrase --text-field sentence
+        python -m app.cli.batch intent corpus.parquet out/intent --intent-data intents.json
+        python -m app.cli.batch intent corpus.parquet out/intent --intent-set food_bot
+'''
+
+import argparse
+import csv
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import torch
+
+from app.config.settings import BATCH_CHUNK_SIZE, BATCH_INFERENCE_SIZE, BATCH_TORCH_THREADS, BATCH_WORKERS
+from app.services.intent_service import IntentService
+from app.services.ner_service import NERService
+from app.services.paraphraser_service import ParaphraseService
+from app.utils.service_manager import ServiceManager
+
+logger = logging.getLogger(__name__)
+
+TASKS = {
+    'ner': NERService,
+    'paraphrase': ParaphraseService,
+    'intent': IntentService,
+}
+
+CHECKPOINT_FILE = '_checkpoint.json'
+
+# Per-process state, populated by `_init_worker` in every worker process
+_worker_state = {}
+
+
+def _iter_jsonl(path: str):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _iter_csv(path: str):
+    with open(path, encoding='utf-8', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def _iter_parquet(path: str, chunk_size: int):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Reading Parquet files requires `pyarrow`. Install it with `pip install pyarrow`.")
+
+    for record_batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield from record_batch.to_pylist()
+
+
+def iter_records(path: str, input_format: str, chunk_size: int):
+    """
+    Streams the records of an input file without loading the whole file into memory.
+
+    Parameters:
+    ----------
+    path : str
+        Path of the input file.
+    input_format : str
+        One of 'jsonl', 'csv' or 'parquet'.
+    chunk_size : int
+        Read size used for formats that are read in blocks.
+
+    Returns:
+    -------
+    iterator
+        An iterator of records as dictionaries.
+
+    Raises:
+    ------
+    ValueError:
+        If the input format is not supported.
+    """
+    if input_format == 'jsonl':
+        return _iter_jsonl(path)
+    if input_format == 'csv':
+        return _iter_csv(path)
+    if input_format == 'parquet':
+        return _iter_parquet(path, chunk_size)
+    raise ValueError(f"Unsupported input format: {input_format}")
+
+
+def iter_chunks(records, chunk_size: int):
+    """
+    Groups a record iterator into numbered chunks of at most `chunk_size` records.
+    """
+    records = iter(records)
+    for index in itertools.count():
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            return
+        yield index, chunk
+
+
+def _detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    raise ValueError(f"Cannot detect the input format of {path}. Pass --format explicitly.")
+
+
+def _write_json_atomic(path: str, payload):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _shard_path(output_dir: str, index: int) -> str:
+    return os.path.join(output_dir, f"part-{index:05d}.jsonl")
+
+
+def _load_checkpoint(output_dir: str, job: dict, overwrite: bool) -> set:
+    """
+    Returns the indices of chunks finished by a previous run of the same job.
+
+    Raises:
+    ------
+    ValueError:
+        If the output directory holds a checkpoint of a different job and `overwrite` is not set.
+    """
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if overwrite or not os.path.exists(path):
+        return set()
+
+    with open(path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+
+    if checkpoint['job'] != job:
+        raise ValueError(f"{output_dir} holds the checkpoint of a different job. Use --overwrite to start over.")
+
+    # Only trust chunks whose shard actually made it to disk
+    return {index for index in checkpoint['completed'] if os.path.exists(_shard_path(output_dir, index))}
+
+
+def _init_worker(task: str, threads: int, intent_data_path: str, intent_set: str):
+    """
+    Loads the service of the given task once per worker process.
+    """
+    torch.set_num_threads(threads)
+
+    service = ServiceManager.get_service(TASKS[task])
+    service.load_model()
+    _worker_state['service'] = service
+
+    if task == 'intent':
+        if intent_set is not None:
+            _worker_state['index'] = service.get_index(intent_set)
+        else:
+            with open(intent_data_path, encoding='utf-8') as f:
+                _worker_state['index'] = service.build_index(json.load(f))
+
+
+def _run_task(task: str, texts: list, batch_size: int) -> list:
+    service = _worker_state['service']
+
+    if task == 'ner':
+        return service.get_full_entity_names_batch(texts, batch_size=batch_size)
+
+    if task == 'paraphrase':
+        results = []
+        for start in range(0, len(texts), batch_size):
+            results += service.paraphrase_batch(texts[start:start + batch_size])
+        return results
+
+    return service.classify_batch(_worker_state['index'], texts)
+
+
+def _texts(records: list, text_field: str, index: int, chunk_size: int) -> list:
+    """
+    Extracts the text of every record of a chunk.
+
+    Raises:
+    ------
+    ValueError:
+        If a record has no value for `text_field`.
+    """
+    texts = []
+    for position, record in enumerate(records):
+        if record.get(text_field) is None:
+            raise ValueError(f"Record {index * chunk_size + position} has no '{text_field}' field. Use --text-field to select the text field.")
+        texts.append(str(record[text_field]))
+    return texts
+
+
+def _process_chunk(task: str, index: int, records: list, text_field: str, chunk_size: int, batch_size: int, output_dir: str) -> tuple:
+    """
+    Runs the task over one chunk of records and writes the results to the chunk's shard.
+
+    Returns:
+    -------
+    tuple
+        The chunk index and the number of written records.
+    """
+    texts = _texts(records, text_field, index, chunk_size)
+    results = _run_task(task, texts, batch_size)
+
+    shard_path = _shard_path(output_dir, index)
+    tmp_path = shard_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for record, result in zip(records, results):
+            f.write(json.dumps({**record, 'result': result}, ensure_ascii=False, default=str) + '\n')
+    os.replace(tmp_path, shard_path)
+
+    return index, len(records)
+
+
+def run(task: str, input_path: str, output_dir: str, input_format: str = None, text_field: str = 'query',
+        chunk_size: int = BATCH_CHUNK_SIZE, batch_size: int = BATCH_INFERENCE_SIZE, workers: int = BATCH_WORKERS,
+        threads: int = BATCH_TORCH_THREADS, intent_data_path: str = None, intent_set: str = None,
+        overwrite: bool = False) -> int:
+    """
+    Runs a batch job and returns the number of records processed by this run.
+
+    Parameters:
+    ----------
+    task : str
+        One of 'ner', 'paraphrase' or 'intent'.
+    input_path : str
+        Path of the JSONL, CSV or Parquet input file.
+    output_dir : str
+        Directory receiving the output shards and the checkpoint file.
+    input_format : str
+        Format of the input file, detected from its extension when omitted.
+    text_field : str
+        Name of the field holding the text to process.
+    chunk_size : int
+        Number of records per chunk, and therefore per output shard.
+    batch_size : int
+        Number of texts sent through the model in a single forward pass.
+    workers : int
+        Number of worker processes.
+    threads : int
+        Number of torch threads used by each worker process.
+    intent_data_path : str
+        JSON file mapping intent labels to example sentences, used by the 'intent' task.
+    intent_set : str
+        Name of a persisted intent set, used by the 'intent' task instead of `intent_data_path`.
+    overwrite : bool
+        Discards the checkpoint of a previous run instead of resuming it.
+
+    Raises:
+    ------
+    ValueError:
+        If the arguments are inconsistent or the output directory belongs to a different job.
+    """
+    if task not in TASKS:
+        raise ValueError(f"Unknown task: {task}")
+    if task == 'intent' and (intent_data_path is None) == (intent_set is None):
+        raise ValueError("The intent task requires exactly one of --intent-data or --intent-set.")
+
+    input_format = input_format or _detect_format(input_path)
+    os.makedirs(output_dir, exist_ok=True)
+
+    job = {
+        'task': task,
+        'input': os.path.abspath(input_path),
+        'text_field': text_field,
+        'chunk_size': chunk_size,
+        'intent_data': os.path.abspath(intent_data_path) if intent_data_path else None,
+        'intent_set': intent_set,
+    }
+    completed = _load_checkpoint(output_dir, job, overwrite)
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+    _write_json_atomic(checkpoint_path, {'job': job, 'completed': sorted(completed)})
+
+    if completed:
+        logger.info(f"Resuming {task} job, skipping {len(completed)} finished chunks")
+
+    processed = 0
+    pending = set()
+    chunks = iter_chunks(iter_records(input_path, input_format, chunk_size), chunk_size)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(task, threads, intent_data_path, intent_set)) as executor:
+        for index, records in chunks:
+            if index in completed:
+                continue
+
+            pending.add(executor.submit(_process_chunk, task, index, records, text_field, chunk_size, batch_size, output_dir))
+
+            # Keep at most two chunks per worker in flight so the input is never fully buffered
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                try:
+                    processed += _collect(done, completed, checkpoint_path, job)
+                except Exception:
+                    _drain(pending, completed, checkpoint_path, job)
+                    raise
+
+        done, _ = wait(pending)
+        processed += _collect(done, completed, checkpoint_path, job)
+
+    return processed
+
+
+def _collect(done, completed: set, checkpoint_path: str, job: dict) -> int:
+    """
+    Checkpoints the chunks of the finished futures and returns their number of records.
+
+    Raises:
+    ------
+    Exception:
+        The error of the first failed chunk, once the successful chunks are checkpointed.
+    """
+    processed = 0
+    error = None
+    for future in done:
+        try:
+            index, count = future.result()
+        except Exception as e:
+            error = error or e
+            continue
+        completed.add(index)
+        processed += count
+        logger.info(f"Finished chunk {index} ({count} records)")
+    _write_json_atomic(checkpoint_path, {'job': job, 'completed': sorted(completed)})
+    if error is not None:
+        raise error
+    return processed
+
+
+def _drain(pending: set, completed: set, checkpoint_path: str, job: dict):
+    """
+    After a failure, cancels the chunks that did not start and checkpoints the running ones that succeed.
+    """
+    for future in pending:
+        future.cancel()
+    done, _ = wait(pending)
+    try:
+        _collect([future for future in done if not future.cancelled()], completed, checkpoint_path, job)
+    except Exception as e:
+        logger.error(f"Another chunk failed: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run NER, paraphrasing or intent classification over a corpus.")
+    parser.add_argument('task', choices=sorted(TASKS))
+    parser.add_argument('input', help="JSONL, CSV or Parquet input file")
+    parser.add_argument('output_dir', help="Directory receiving the output shards and checkpoint")
+    parser.add_argument('--format', choices=['jsonl', 'csv', 'parquet'], default=None, help="Input format, detected from the extension by default")
+    parser.add_argument('--text-field', default='query', help="Field holding the text to process")
+    parser.add_argument('--chunk-size', type=int, default=BATCH_CHUNK_SIZE, help="Records per chunk and output shard")
+    parser.add_argument('--batch-size', type=int, default=BATCH_INFERENCE_SIZE, help="Texts per forward pass")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help="Number of worker processes")
+    parser.add_argument('--threads', type=int, default=BATCH_TORCH_THREADS, help="Torch threads per worker process")
+    parser.add_argument('--intent-data', default=None, help="JSON file mapping intent labels to example sentences")
+    parser.add_argument('--intent-set', default=None, help="Name of a persisted intent set")
+    parser.add_argument('--overwrite', action='store_true', help="Ignore an existing checkpoint and start over")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    try:
+        processed = run(
+            args.task, args.input, args.output_dir,
+            input_format=args.format,
+            text_field=args.text_field,
+            chunk_size=args.chunk_size,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            threads=args.threads,
+            intent_data_path=args.intent_data,
+            intent_set=args.intent_set,
+            overwrite=args.overwrite,
+        )
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    logger.info(f"Processed {processed} records")
+
+
+if __name__ == '__main__':
+    main()
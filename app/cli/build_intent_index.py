@@ -0,0 +1,56 @@
+'''
+    Builds a persisted intent set offline.
+
+    The example sentences are embedded once and saved under `INTENT_INDEX_DIR`, where the API and the batch
+    runner load them with memory mapping at startup. Requests then refer to the intent set by name.
+
+    Intent sets built with a different encoder are not served. After changing the encoder or its truncation
+    settings, re-embed them from their stored sentences with `--rebuild-stale`.
+
+    Usage:
+        python -m app.cli.build_intent_index food_bot intents.json
+        python -m app.cli.build_intent_index --rebuild-stale
+'''
+
+import argparse
+import json
+import logging
+
+from app.services.intent_service import IntentService
+from app.utils.service_manager import ServiceManager
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embed an intent set and save it for memory-mapped loading.")
+    parser.add_argument('name', nargs='?', help="Name of the intent set (letters, digits, '_' and '-')")
+    parser.add_argument('data', nargs='?', help="JSON file mapping intent labels to example sentences")
+    parser.add_argument('--rebuild-stale', action='store_true', help="Re-embed the intent sets built with a different encoder")
+    args = parser.parse_args(argv)
+
+    if args.rebuild_stale == (args.name is not None):
+        parser.error("pass either a name and a data file, or --rebuild-stale")
+    if args.name is not None and args.data is None:
+        parser.error("the data file is required")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    service = ServiceManager.get_service(IntentService)
+    service.load_model()
+
+    if args.rebuild_stale:
+        rebuilt = service.rebuild_stale_indexes()
+        logger.info(f"Re-embedded {len(rebuilt)} intent sets: {', '.join(rebuilt) or '-'}")
+        return
+
+    with open(args.data, encoding='utf-8') as f:
+        data = json.load(f)
+
+    index = service.build_index(data)
+    service.save_index(args.name, index)
+    logger.info(f"Saved intent set {args.name} with {len(index.labels)} labels and {len(index)} examples")
+
+
+if __name__ == '__main__':
+    main()
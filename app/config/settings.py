@@ -6,4 +6,51 @@ PARAPHRASER_MODEL_PATH = "app/model_files/paraphraser.ckpt"
 
 ## Intent Classification Settings
 BERT_BASE_TOKENIZER = "HooshvareLab/bert-base-parsbert-uncased"
-BERT_BASE_MODEL = "HooshvareLab/bert-base-parsbert-uncased"
\ No newline at end of file
+BERT_BASE_MODEL = "HooshvareLab/bert-base-parsbert-uncased"
+INTENT_INDEX_DIR = "app/model_files/intent_indexes"
+INTENT_EMBEDDING_CACHE_SIZE = 10000
+
+## Encoder Execution Settings
+# Truncation policies: 'head' keeps the first tokens, 'tail' the last ones and 'head+tail' the first
+# ENCODER_HEAD_TOKENS tokens plus the end of the text
+INTENT_MAX_LENGTH = 512
+INTENT_TRUNCATION = "head+tail"
+NER_MAX_LENGTH = 512
+NER_TRUNCATION = "head"
+ENCODER_HEAD_TOKENS = 128
+ENCODER_LENGTH_BUCKETS = (16, 32, 64, 128, 256, 512)
+ENCODER_MAX_BATCH_TOKENS = 8192
+ENCODER_MAX_BATCH_SIZE = 32
+# Time the encoder waits for concurrent requests to queue work before running a batch that is not full
+ENCODER_BATCH_WINDOW = 0.002
+ENCODER_POLL_INTERVAL = 0.05
+
+## Offline Batch Settings
+BATCH_CHUNK_SIZE = 512
+BATCH_INFERENCE_SIZE = 32
+BATCH_WORKERS = 1
+BATCH_TORCH_THREADS = 1
+
+## Request Deadline Settings (seconds)
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout"
+NER_TIMEOUT = 10
+PARAPHRASE_TIMEOUT = 30
+INTENT_TIMEOUT = 30
+EMBED_TIMEOUT = 30
+MAX_REQUEST_TIMEOUT = 120
+DISCONNECT_POLL_INTERVAL = 0.1
+
+## Intent Admission Settings
+INTENT_CHARS_PER_TOKEN = 4
+INTENT_MAX_QUERIES = 256
+INTENT_MAX_LABELS = 200
+INTENT_MAX_EXAMPLES = 2000
+INTENT_MAX_SENTENCE_LENGTH = 1000
+INTENT_MAX_REQUEST_COST = 60000
+INTENT_MAX_CONCURRENCY = 2
+INTENT_MAX_QUEUED_COST = 200000
+INTENT_MAX_CLIENT_QUEUED_COST = 60000
+# Fair share weight per raw API key (the value of the CLIENT_KEY_HEADER header); other clients weigh 1
+INTENT_CLIENT_WEIGHTS = {}
+CLIENT_KEY_HEADER = "X-API-Key"
+ADMISSION_POLL_INTERVAL = 0.05
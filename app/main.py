@@ -1,9 +1,17 @@
 import asyncio
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from app.api.router import api_router
 from contextlib import asynccontextmanager
 from app.services.index import get_ner_service, get_paraphrase_service, get_intent_service
 
+try:
+    # orjson renders responses several times faster than the standard json module
+    import orjson
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
+
 async def load_model_async(service):
     loop = asyncio.get_running_loop()
     await loop.run_in_executor(None, service.load_model)
@@ -22,5 +30,5 @@ async def lifespan(app: FastAPI):
     yield
     # Any shutdown procedures goes here
 
-app = FastAPI(title="NLP Services with FastAPI", version="1.0.0", lifespan=lifespan)
+app = FastAPI(title="NLP Services with FastAPI", version="1.0.0", lifespan=lifespan, default_response_class=DefaultResponse)
 app.include_router(api_router)
\ No newline at end of file
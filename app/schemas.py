@@ -1,12 +1,32 @@
-from pydantic import BaseModel
-from typing import Dict
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from typing import Dict, List, Literal, Optional, Union
 
 class NERSchema(BaseModel):
     query: str
 
+class NERResponse(BaseModel):
+    """
+    Named entities of a text grouped by entity type.
+    """
+    organization: List[str]
+    money: List[str]
+    location: List[str]
+    person: List[str]
+    time: List[str]
+    date: List[str]
+    percent: List[str]
+
 class ParaphraserSchema(BaseModel):
     query: str
 
+class ParaphraseResponse(BaseModel):
+    result: str
+
+def _check_intent_source(schema):
+    if (schema.data is None) == (schema.intent_set is None):
+        raise ValueError("Provide exactly one of `data` or `intent_set`.")
+    return schema
+
 class IntentSchema(BaseModel):
     """
     Schema for intent classification input using Pydantic.
@@ -17,8 +37,126 @@ class IntentSchema(BaseModel):
     ----------
     query : str
         The input sentence to classify.
-    data : Dict
+    data : Dict[str, List[str]]
         A dictionary where keys are intent labels and values are lists of example sentences.
+    intent_set : str
+        Name of a persisted intent set to classify against instead of sending `data`.
     """
     query: str
-    data: Dict
\ No newline at end of file
+    data: Optional[Dict[str, List[str]]] = None
+    intent_set: Optional[str] = None
+
+    @model_validator(mode='after')
+    def check_intent_source(self):
+        return _check_intent_source(self)
+
+class IntentResponse(BaseModel):
+    """
+    Intent classification result of one query.
+
+    Attributes:
+    ----------
+    indices : List[int]
+        Intent label index of each nearest neighbor, serialized as "Indices".
+    values : List[float]
+        Distance to each nearest neighbor, serialized as "Values".
+    majority_class : int
+        Most frequent intent label index among the neighbors, serialized as "Majority Class".
+    label : str
+        Name of the majority class, serialized as "Label". Unlike the indices, it stays stable when labels are
+        removed from a persisted intent set.
+    """
+    model_config = ConfigDict(populate_by_name=True)
+
+    indices: List[int] = Field(alias='Indices')
+    values: List[float] = Field(alias='Values')
+    majority_class: int = Field(alias='Majority Class')
+    label: str = Field(alias='Label')
+
+class IntentBatchSchema(BaseModel):
+    """
+    Schema for classifying several queries against one intent set in a single call.
+
+    Attributes:
+    ----------
+    queries : List[str]
+        The input sentences to classify.
+    data : Dict[str, List[str]]
+        A dictionary where keys are intent labels and values are lists of example sentences.
+    intent_set : str
+        Name of a persisted intent set to classify against instead of sending `data`.
+    k : int
+        Number of nearest neighbors returned per query and used for the majority vote.
+    """
+    queries: List[str] = Field(min_length=1)
+    data: Optional[Dict[str, List[str]]] = None
+    intent_set: Optional[str] = None
+    k: int = Field(default=3, ge=1, le=50)
+
+    @model_validator(mode='after')
+    def check_intent_source(self):
+        return _check_intent_source(self)
+
+class IntentBatchResponse(BaseModel):
+    results: List[IntentResponse]
+
+class IntentSetSchema(BaseModel):
+    """
+    Schema for creating or replacing a persisted intent set.
+
+    Attributes:
+    ----------
+    data : Dict[str, List[str]]
+        A dictionary where keys are intent labels and values are lists of example sentences.
+    """
+    data: Dict[str, List[str]]
+
+class IntentExamplesSchema(BaseModel):
+    """
+    Schema for adding or removing example sentences of one label of a persisted intent set.
+
+    Attributes:
+    ----------
+    label : str
+        The intent label the examples belong to.
+    sentences : List[str]
+        The example sentences to add or remove.
+    """
+    label: str
+    sentences: List[str]
+
+class IntentLabelSchema(BaseModel):
+    """
+    Schema for renaming a label of a persisted intent set.
+
+    Attributes:
+    ----------
+    new_label : str
+        The new name of the label.
+    """
+    new_label: str
+
+class EmbeddingSchema(BaseModel):
+    """
+    Schema for sentence embedding input.
+
+    Attributes:
+    ----------
+    texts : List[str]
+        The input texts to embed.
+    dtype : str
+        Output precision: 'float32', 'float16' or 'int8' (L2-normalized vectors scaled by 127).
+    format : str
+        Response format: 'json', 'npy' (a NumPy `.npy` file) or 'raw' (the C-ordered array buffer).
+    normalize : bool
+        L2-normalizes the vectors, so dot products equal cosine similarities.
+    """
+    texts: List[str] = Field(min_length=1)
+    dtype: Literal['float32', 'float16', 'int8'] = 'float32'
+    format: Literal['json', 'npy', 'raw'] = 'json'
+    normalize: bool = False
+
+class EmbeddingResponse(BaseModel):
+    dim: int
+    dtype: str
+    embeddings: List[List[Union[int, float]]]
@@ -0,0 +1,97 @@
+import io
+
+import numpy as np
+
+from app.services.intent_service import IntentService
+from app.utils.deadline import Deadline
+from app.utils.service_manager import ServiceManager
+
+EMBEDDING_DTYPES = ('float32', 'float16', 'int8')
+
+
+class EmbeddingService:
+    """
+    Service for sentence embeddings, built on the encoder of the intent classification service.
+
+    The vectors are the mean-pooled ParsBERT representations the intent classifier compares. The service reuses
+    the model and the embedding cache of the `IntentService` singleton instead of loading its own copy.
+
+    Attributes:
+    ----------
+    intent_service : IntentService
+        The intent classification service providing the encoder and its embedding cache.
+
+    Methods:
+    -------
+    load_model():
+        Loads the underlying intent classification service if it is not loaded yet.
+
+    embed(texts: list, dtype: str = 'float32', normalize: bool = False, deadline: Deadline = None):
+        Embeds a list of texts and returns the vectors in the requested dtype.
+
+    to_npy(vectors: numpy.ndarray):
+        Serializes vectors in the NumPy `.npy` format.
+    """
+    def __init__(self):
+        """
+        Initializes the EmbeddingService instance.
+        """
+        self.intent_service = ServiceManager.get_service(IntentService)
+
+    @property
+    def loaded(self) -> bool:
+        return self.intent_service.loaded
+
+    def load_model(self):
+        """
+        Loads the underlying intent classification service if it is not loaded yet.
+        """
+        if not self.intent_service.loaded:
+            self.intent_service.load_model()
+
+    def embed(self, texts: list, dtype: str = 'float32', normalize: bool = False, deadline: Deadline = None) -> np.ndarray:
+        """
+        Embeds a list of texts in batched forward passes.
+
+        Parameters:
+        ----------
+        texts : list
+            The input texts.
+        dtype : str
+            One of 'float32', 'float16' or 'int8'. int8 vectors are L2-normalized first and scaled by 127, so
+            every component fits the int8 range and dot products approximate cosine similarity times 127^2.
+        normalize : bool
+            L2-normalizes the vectors, so dot products equal cosine similarities.
+        deadline : Deadline
+            Optional deadline, checked before every forward pass.
+
+        Returns:
+        -------
+        numpy.ndarray
+            A matrix of shape (len(texts), hidden_size) in the requested dtype.
+
+        Raises:
+        ------
+        ValueError:
+            If the dtype is not supported or the model is not loaded.
+        """
+        if dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+        vectors = self.intent_service.embed_sentences(texts, deadline)
+
+        if normalize or dtype == 'int8':
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+
+        if dtype == 'int8':
+            return np.clip(np.rint(vectors * 127), -127, 127).astype(np.int8)
+        return vectors.astype(dtype, copy=False)
+
+    def to_npy(self, vectors: np.ndarray) -> bytes:
+        """
+        Serializes vectors in the NumPy `.npy` format, readable with `numpy.load`.
+        """
+        buffer = io.BytesIO()
+        np.save(buffer, vectors, allow_pickle=False)
+        return buffer.getvalue()
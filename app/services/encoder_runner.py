@@ -0,0 +1,310 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+import torch
+
+from app.config.settings import (
+    ENCODER_HEAD_TOKENS,
+    ENCODER_LENGTH_BUCKETS,
+    ENCODER_MAX_BATCH_TOKENS,
+    ENCODER_MAX_BATCH_SIZE,
+    ENCODER_BATCH_WINDOW,
+    ENCODER_POLL_INTERVAL,
+)
+from app.utils.deadline import Deadline
+from app.utils.stats import Stats
+
+TRUNCATION_POLICIES = ('head', 'tail', 'head+tail')
+
+
+class _Call:
+    """
+    Sequences queued by one `run` call and their outputs.
+    """
+    def __init__(self, size: int, batch_size: int):
+        self.results = [None] * size
+        self.remaining = size
+        self.batch_size = batch_size
+        self.error = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+
+class _Sequence:
+    __slots__ = ('call', 'position', 'input_ids', 'queued_at')
+
+    def __init__(self, call: _Call, position: int, input_ids: list):
+        self.call = call
+        self.position = position
+        self.input_ids = input_ids
+        self.queued_at = time.monotonic()
+
+
+class EncoderRunner:
+    """
+    Shared execution layer running a BERT encoder over many texts.
+
+    Texts are tokenized once without padding and truncated to the maximum length with a configurable policy.
+    The sequences of every `run` call, whichever request thread makes it, are queued by length bucket. A single
+    executor thread waits up to `batch_window` seconds for concurrent calls to queue more work, then runs the
+    bucket holding the oldest sequence as one batch of at most `max_batch_size` sequences and `max_batch_tokens`
+    padded tokens. Concurrent single-text requests therefore share forward passes, and every forward pass pads
+    to the longest sequence of its bucket instead of the longest text of a request. The latency of every forward
+    pass and the time sequences spend queued are recorded per bucket in `Stats`.
+
+    Attributes:
+    ----------
+    name : str
+        Name used for the stats, such as 'intent' or 'ner'.
+    model : transformers.PreTrainedModel
+        The encoder.
+    tokenizer : transformers.PreTrainedTokenizer
+        Tokenizer of the encoder.
+    forward : callable
+        Called with a batch dictionary holding the padded `input_ids` and `attention_mask` tensors, under
+        `torch.no_grad()`. It returns one output per row, such as a tensor or array indexed by row.
+    max_length : int
+        Maximum number of tokens of a sequence, special tokens included, capped by the model's position embeddings.
+    truncation : str
+        One of 'head', 'tail' or 'head+tail'.
+    head_tokens : int
+        Number of tokens kept from the start of the text with the 'head+tail' policy.
+    buckets : tuple
+        Increasing upper bounds of the length buckets.
+    max_batch_tokens : int
+        Maximum number of padded tokens in a single forward pass.
+    max_batch_size : int
+        Maximum number of sequences in a single forward pass.
+    batch_window : float
+        Time in seconds the executor waits for concurrent calls before running a batch that is not full.
+
+    Methods:
+    -------
+    encode(texts: list, offsets: bool = False):
+        Tokenizes and truncates texts, adding the special tokens.
+
+    run(encodings: list, batch_size: int = None, deadline: Deadline = None):
+        Queues encodings for length-bucketed batches and returns the per-row outputs of `forward` in input order.
+    """
+    def __init__(self, name: str, model, tokenizer, forward, max_length: int = 512, truncation: str = 'head',
+                 head_tokens: int = ENCODER_HEAD_TOKENS, buckets: tuple = ENCODER_LENGTH_BUCKETS,
+                 max_batch_tokens: int = ENCODER_MAX_BATCH_TOKENS, max_batch_size: int = ENCODER_MAX_BATCH_SIZE,
+                 batch_window: float = ENCODER_BATCH_WINDOW):
+        """
+        Initializes the EncoderRunner instance.
+
+        Raises:
+        ------
+        ValueError:
+            If the truncation policy is unknown.
+        """
+        if truncation not in TRUNCATION_POLICIES:
+            raise ValueError(f"Unknown truncation policy: {truncation}. Expected one of {TRUNCATION_POLICIES}")
+
+        self.name = name
+        self.model = model
+        self.tokenizer = tokenizer
+        self.forward = forward
+        self.max_length = min(max_length, getattr(model.config, 'max_position_embeddings', max_length))
+        self.truncation = truncation
+        self.head_tokens = head_tokens
+        self.buckets = tuple(sorted(buckets))
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self._condition = threading.Condition()
+        self._queues = {}
+        self._queued = 0
+        self._executor = None
+
+    def _truncate(self, special_tokens_mask: list) -> np.ndarray:
+        """
+        Returns the positions kept by the truncation policy: every special token and the selected text tokens.
+        """
+        special = np.array(special_tokens_mask, dtype=bool)
+        text_positions = np.flatnonzero(~special)
+        budget = self.max_length - int(special.sum())
+        if len(text_positions) <= budget:
+            return np.arange(len(special))
+        if budget <= 0:
+            raise ValueError(f"Maximum length {self.max_length} leaves no room for text tokens")
+
+        if self.truncation == 'head':
+            kept = text_positions[:budget]
+        elif self.truncation == 'tail':
+            kept = text_positions[len(text_positions) - budget:]
+        else:
+            head = min(self.head_tokens, budget)
+            kept = np.concatenate([text_positions[:head], text_positions[len(text_positions) - (budget - head):]])
+        return np.sort(np.concatenate([np.flatnonzero(special), kept]))
+
+    def encode(self, texts: list, offsets: bool = False) -> list:
+        """
+        Tokenizes and truncates texts, adding the special tokens.
+
+        Parameters:
+        ----------
+        texts : list
+            The input texts.
+        offsets : bool
+            Also returns the character offsets of every token; requires a fast tokenizer.
+
+        Returns:
+        -------
+        list
+            One `(input_ids, offsets)` pair per text. `offsets` is an array of shape (tokens, 2) in which special
+            tokens are (0, 0), or None when offsets are not requested.
+
+        Raises:
+        ------
+        ValueError:
+            If the maximum length leaves no room for text tokens.
+        """
+        if not texts:
+            return []
+
+        tokens = self.tokenizer(list(texts), return_special_tokens_mask=True, return_offsets_mapping=offsets, verbose=False)
+        encodings = []
+        for row, ids in enumerate(tokens['input_ids']):
+            kept = self._truncate(tokens['special_tokens_mask'][row])
+            if len(kept) < len(ids):
+                Stats.increment(f"encoder.{self.name}.truncated")
+
+            input_ids = np.asarray(ids, dtype=np.int64)[kept].tolist()
+            token_offsets = None
+            if offsets:
+                token_offsets = np.asarray(tokens['offset_mapping'][row], dtype=np.int64).reshape(-1, 2)[kept]
+                # Special tokens never map to characters of the text
+                token_offsets[np.asarray(tokens['special_tokens_mask'][row], dtype=bool)[kept]] = 0
+            encodings.append((input_ids, token_offsets))
+        return encodings
+
+    def _bucket_name(self, length: int) -> str:
+        position = int(np.searchsorted(self.buckets, length))
+        return f"bucket_{self.buckets[position]}" if position < len(self.buckets) else "bucket_max"
+
+    def run(self, encodings: list, batch_size: int = None, deadline: Deadline = None) -> list:
+        """
+        Queues encodings for length-bucketed batches and waits for their outputs.
+
+        Parameters:
+        ----------
+        encodings : list
+            Output of `encode`.
+        batch_size : int
+            Maximum number of sequences in a forward pass holding sequences of this call, capped by `max_batch_size`.
+        deadline : Deadline
+            Optional deadline, checked while waiting. Sequences of an abandoned call are dropped from the queue.
+
+        Returns:
+        -------
+        list
+            The output of `forward` for every encoding, in input order. Per-token outputs keep the padding
+            of their batch, so they have to be cut to the length of the encoding.
+
+        Raises:
+        ------
+        DeadlineExceeded:
+            If the deadline passed or the request was cancelled.
+        """
+        if not encodings:
+            return []
+        if deadline is not None:
+            deadline.check()
+
+        call = _Call(len(encodings), min(batch_size or self.max_batch_size, self.max_batch_size))
+        with self._condition:
+            for position, (input_ids, _) in enumerate(encodings):
+                bucket = self._bucket_name(len(input_ids))
+                self._queues.setdefault(bucket, deque()).append(_Sequence(call, position, input_ids))
+            self._queued += len(encodings)
+            if self._executor is None:
+                self._executor = threading.Thread(target=self._execute_forever, name=f"encoder-{self.name}", daemon=True)
+                self._executor.start()
+            self._condition.notify_all()
+
+        while not call.done.wait(ENCODER_POLL_INTERVAL):
+            if deadline is not None and deadline.expired:
+                call.cancelled = True
+                deadline.check()
+
+        if call.error is not None:
+            raise call.error
+        return call.results
+
+    def _full_bucket(self) -> bool:
+        return any(len(queue) >= self.max_batch_size for queue in self._queues.values())
+
+    def _next_batch(self) -> tuple:
+        """
+        Takes the next batch from the bucket holding the oldest sequence. The caller holds `_condition`.
+        """
+        bucket = min((queue[0].queued_at, name) for name, queue in self._queues.items() if queue)[1]
+        queue = self._queues[bucket]
+        batch, width, limit = [], 0, self.max_batch_size
+        while queue and len(batch) < limit:
+            sequence = queue[0]
+            if sequence.call.cancelled:
+                queue.popleft()
+                self._queued -= 1
+                continue
+            next_width = max(width, len(sequence.input_ids))
+            if batch and (len(batch) + 1 > sequence.call.batch_size or (len(batch) + 1) * next_width > self.max_batch_tokens):
+                break
+            queue.popleft()
+            self._queued -= 1
+            batch.append(sequence)
+            width = next_width
+            limit = min(limit, sequence.call.batch_size)
+        return bucket, batch
+
+    def _execute_forever(self):
+        while True:
+            with self._condition:
+                while not self._queued:
+                    self._condition.wait()
+                # Give concurrent calls a short window to queue work of similar lengths
+                oldest = min(queue[0].queued_at for queue in self._queues.values() if queue)
+                while not self._full_bucket() and time.monotonic() - oldest < self.batch_window:
+                    self._condition.wait(self.batch_window - (time.monotonic() - oldest))
+                bucket, batch = self._next_batch()
+            if batch:
+                self._execute(bucket, batch)
+
+    def _execute(self, bucket: str, batch: list):
+        """
+        Runs one forward pass and hands its outputs to the waiting calls.
+        """
+        Stats.observe(f"encoder.{self.name}.{bucket}.queue_wait", time.monotonic() - min(sequence.queued_at for sequence in batch))
+        width = max(len(sequence.input_ids) for sequence in batch)
+        started = time.perf_counter()
+        try:
+            input_ids = torch.full((len(batch), width), self.tokenizer.pad_token_id or 0, dtype=torch.long)
+            attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+            for row, sequence in enumerate(batch):
+                input_ids[row, :len(sequence.input_ids)] = torch.tensor(sequence.input_ids, dtype=torch.long)
+                attention_mask[row, :len(sequence.input_ids)] = 1
+            with torch.no_grad():
+                outputs = self.forward({'input_ids': input_ids, 'attention_mask': attention_mask})
+        except Exception as e:
+            # Fail the calls of the batch and drop the rest of their queued sequences
+            for sequence in batch:
+                sequence.call.error = e
+                sequence.call.cancelled = True
+                sequence.call.done.set()
+            return
+
+        Stats.observe(f"encoder.{self.name}.{bucket}", time.perf_counter() - started)
+        Stats.increment(f"encoder.{self.name}.{bucket}.sequences", len(batch))
+        Stats.increment(f"encoder.{self.name}.{bucket}.padded_tokens", len(batch) * width)
+        calls = {id(sequence.call) for sequence in batch}
+        if len(calls) > 1:
+            Stats.increment(f"encoder.{self.name}.{bucket}.shared_batches")
+
+        for row, sequence in enumerate(batch):
+            call = sequence.call
+            call.results[sequence.position] = outputs[row]
+            call.remaining -= 1
+            if call.remaining == 0:
+                call.done.set()
@@ -3,6 +3,8 @@ from app.utils.service_manager import ServiceManager
 from app.services.ner_service import NERService
 from app.services.paraphraser_service import ParaphraseService
 from app.services.intent_service import IntentService
+from app.services.embedding_service import EmbeddingService
+from app.utils.admission import IntentScheduler
 
 def get_ner_service():
     return ServiceManager.get_service(NERService)
@@ -11,4 +13,10 @@ def get_paraphrase_service():
     return ServiceManager.get_service(ParaphraseService)
 
 def get_intent_service():
-    return ServiceManager.get_service(IntentService)
\ No newline at end of file
+    return ServiceManager.get_service(IntentService)
+
+def get_embedding_service():
+    return ServiceManager.get_service(EmbeddingService)
+
+def get_intent_scheduler():
+    return ServiceManager.get_service(IntentScheduler)
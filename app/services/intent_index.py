@@ -0,0 +1,292 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+
+class EmptyIntentIndex(ValueError):
+    """
+    Raised when classifying against an intent set that has no examples.
+    """
+
+
+class IntentIndex:
+    """
+    Precomputed example embeddings of an intent set.
+
+    An index holds one embedding row per example sentence, the intent label of every row and the
+    fingerprint of the encoder that produced the embeddings. It can be saved to a directory and loaded
+    back with memory mapping, so every worker process serving the same index shares a single copy of the
+    matrix through the operating system's page cache.
+
+    On disk an index is a directory with three files:
+        embeddings.npy      float32 matrix of shape (examples, hidden_size)
+        example_labels.npy  int32 vector holding the label index of every row
+        meta.json           label table, example sentences and encoder fingerprint
+
+    Attributes:
+    ----------
+    labels : list
+        Intent labels, in the order used by `example_labels`.
+    sentences : list
+        The raw example sentences, one per embedding row.
+    embeddings : numpy.ndarray
+        Example embeddings, possibly a read-only memory map.
+    example_labels : numpy.ndarray
+        Label index of every embedding row.
+    fingerprint : str
+        Fingerprint of the encoder that produced the embeddings.
+    """
+    EMBEDDINGS_FILE = 'embeddings.npy'
+    EXAMPLE_LABELS_FILE = 'example_labels.npy'
+    META_FILE = 'meta.json'
+
+    def __init__(self, labels: list, sentences: list, embeddings: np.ndarray, example_labels: np.ndarray, fingerprint: str):
+        """
+        Initializes the IntentIndex instance.
+
+        Raises:
+        ------
+        ValueError:
+            If the number of sentences, embedding rows and example labels differ.
+        """
+        if not len(sentences) == len(embeddings) == len(example_labels):
+            raise ValueError("Intent index needs exactly one sentence and one label per embedding row.")
+        self.labels = list(labels)
+        self.sentences = list(sentences)
+        self.embeddings = embeddings
+        self.example_labels = example_labels
+        self.fingerprint = fingerprint
+        self._squared_norms = None
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def to_data(self) -> dict:
+        """
+        Returns the intent set as a dictionary mapping intent labels to example sentences.
+        """
+        data = {label: [] for label in self.labels}
+        for sentence, label_index in zip(self.sentences, self.example_labels.tolist()):
+            data[self.labels[label_index]].append(sentence)
+        return data
+
+    def add_examples(self, label: str, sentences: list, embeddings: np.ndarray) -> 'IntentIndex':
+        """
+        Returns a copy of the index with new example sentences appended to a label.
+
+        The label is created if it does not exist yet. Existing rows are reused as they are, so only
+        the new sentences have to be embedded by the caller.
+
+        Parameters:
+        ----------
+        label : str
+            Intent label of the new examples.
+        sentences : list
+            The new example sentences.
+        embeddings : numpy.ndarray
+            Embeddings of the new sentences, one row per sentence.
+
+        Returns:
+        -------
+        IntentIndex
+            The updated index. The current index is left untouched so concurrent searches stay consistent.
+        """
+        labels = self.labels if label in self.labels else self.labels + [label]
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(sentences), -1)
+        new_labels = np.full(len(sentences), labels.index(label), dtype=np.int32)
+        index = IntentIndex(
+            labels,
+            self.sentences + list(sentences),
+            np.concatenate([self.embeddings, embeddings]) if len(self) else embeddings,
+            np.concatenate([self.example_labels, new_labels]),
+            self.fingerprint,
+        )
+        if self._squared_norms is not None:
+            index._squared_norms = np.concatenate([self._squared_norms, np.einsum('ij,ij->i', embeddings, embeddings)])
+        return index
+
+    def remove_examples(self, label: str, sentences: list) -> 'IntentIndex':
+        """
+        Returns a copy of the index without the given example sentences of a label.
+
+        Raises:
+        ------
+        KeyError:
+            If the label does not exist.
+        """
+        if label not in self.labels:
+            raise KeyError(label)
+        label_index = self.labels.index(label)
+        removed = set(sentences)
+        keep = np.array([
+            not (row_label == label_index and sentence in removed)
+            for sentence, row_label in zip(self.sentences, self.example_labels.tolist())
+        ], dtype=bool)
+        return self._select(keep, self.labels, self.example_labels)
+
+    def rename_label(self, label: str, new_label: str) -> 'IntentIndex':
+        """
+        Returns a copy of the index with a label renamed. No embedding is touched.
+
+        Raises:
+        ------
+        KeyError:
+            If the label does not exist.
+        ValueError:
+            If the new label already exists.
+        """
+        if label not in self.labels:
+            raise KeyError(label)
+        if new_label in self.labels:
+            raise ValueError(f"Intent label already exists: {new_label}")
+        labels = [new_label if existing == label else existing for existing in self.labels]
+        index = IntentIndex(labels, self.sentences, self.embeddings, self.example_labels, self.fingerprint)
+        index._squared_norms = self._squared_norms
+        return index
+
+    def remove_label(self, label: str) -> 'IntentIndex':
+        """
+        Returns a copy of the index without a label and its examples. Later labels shift down by one.
+
+        Raises:
+        ------
+        KeyError:
+            If the label does not exist.
+        """
+        if label not in self.labels:
+            raise KeyError(label)
+        label_index = self.labels.index(label)
+        keep = self.example_labels != label_index
+        example_labels = self.example_labels - (self.example_labels > label_index).astype(np.int32)
+        return self._select(keep, self.labels[:label_index] + self.labels[label_index + 1:], example_labels)
+
+    def _select(self, keep: np.ndarray, labels: list, example_labels: np.ndarray) -> 'IntentIndex':
+        index = IntentIndex(
+            labels,
+            [sentence for sentence, kept in zip(self.sentences, keep.tolist()) if kept],
+            self.embeddings[keep],
+            example_labels[keep],
+            self.fingerprint,
+        )
+        if self._squared_norms is not None:
+            index._squared_norms = self._squared_norms[keep]
+        return index
+
+    def search(self, targets: np.ndarray, k: int = 3) -> tuple:
+        """
+        Finds the nearest examples of several query embeddings with a single matrix product.
+
+        Parameters:
+        ----------
+        targets : numpy.ndarray
+            Query embeddings of shape (queries, hidden_size).
+        k : int
+            Number of neighbors returned per query, capped by the number of examples.
+
+        Returns:
+        -------
+        tuple
+            A `(distances, indices)` pair of arrays of shape (queries, k), sorted by increasing euclidean distance.
+
+        Raises:
+        ------
+        EmptyIntentIndex:
+            If the index has no examples.
+        """
+        if len(self) == 0:
+            raise EmptyIntentIndex("Intent set has no examples.")
+        k = min(k, len(self))
+
+        if self._squared_norms is None:
+            self._squared_norms = np.einsum('ij,ij->i', self.embeddings, self.embeddings)
+
+        # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b, computed for all query/example pairs at once
+        squared_distances = targets @ self.embeddings.T
+        squared_distances *= -2
+        squared_distances += self._squared_norms
+        squared_distances += np.einsum('ij,ij->i', targets, targets)[:, None]
+        np.maximum(squared_distances, 0, out=squared_distances)
+
+        indices = np.argpartition(squared_distances, k - 1, axis=1)[:, :k]
+        nearest = np.take_along_axis(squared_distances, indices, axis=1)
+        order = np.argsort(nearest, axis=1)
+        indices = np.take_along_axis(indices, order, axis=1)
+        distances = np.sqrt(np.take_along_axis(nearest, order, axis=1))
+        return distances, indices
+
+    def save(self, path: str):
+        """
+        Writes the index to a directory, replacing any index previously saved there.
+
+        The files are written to a temporary directory with a unique name first and swapped in afterwards, so
+        readers never observe a half-written index and concurrent writers never remove each other's files.
+        Processes that memory-mapped the old files keep working on them. Writers of the same path should still
+        be serialized, otherwise the last swap wins.
+
+        Parameters:
+        ----------
+        path : str
+            Directory receiving the index files.
+        """
+        path = os.path.abspath(path)
+        parent, name = os.path.split(path)
+        os.makedirs(parent, exist_ok=True)
+        # Names starting with '.' are never taken for intent sets
+        tmp_path = tempfile.mkdtemp(prefix=f".{name}.tmp-", dir=parent)
+        old_path = tmp_path + '.old'
+
+        try:
+            os.chmod(tmp_path, 0o755)
+            np.save(os.path.join(tmp_path, self.EMBEDDINGS_FILE), np.ascontiguousarray(self.embeddings, dtype=np.float32))
+            np.save(os.path.join(tmp_path, self.EXAMPLE_LABELS_FILE), np.ascontiguousarray(self.example_labels, dtype=np.int32))
+            with open(os.path.join(tmp_path, self.META_FILE), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'fingerprint': self.fingerprint,
+                    'labels': self.labels,
+                    'sentences': self.sentences,
+                }, f, ensure_ascii=False)
+
+            if os.path.exists(path):
+                os.replace(path, old_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(old_path) and not os.path.exists(path):
+                os.replace(old_path, path)
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        """
+        Loads an index saved with `save`.
+
+        Parameters:
+        ----------
+        path : str
+            Directory holding the index files.
+        mmap : bool
+            Memory-maps the embedding matrix read-only instead of reading it into memory.
+
+        Returns:
+        -------
+        IntentIndex
+            The loaded index.
+        """
+        mmap_mode = 'r' if mmap else None
+        with open(os.path.join(path, cls.META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        embeddings = np.load(os.path.join(path, cls.EMBEDDINGS_FILE), mmap_mode=mmap_mode)
+        example_labels = np.load(os.path.join(path, cls.EXAMPLE_LABELS_FILE))
+        return cls(meta['labels'], meta['sentences'], embeddings, example_labels, meta['fingerprint'])
+
+    @classmethod
+    def read_fingerprint(cls, path: str) -> str:
+        """
+        Returns the encoder fingerprint of a saved index without loading its embeddings.
+        """
+        with open(os.path.join(path, cls.META_FILE), encoding='utf-8') as f:
+            return json.load(f)['fingerprint']
@@ -1,8 +1,31 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+import numpy as np
 import torch
 from transformers import AutoConfig, AutoTokenizer, AutoModel
 from hazm import Normalizer
 from transformers import AutoTokenizer
-from app.config.settings import BERT_BASE_MODEL, BERT_BASE_TOKENIZER
+from app.config.settings import (
+    BERT_BASE_MODEL,
+    BERT_BASE_TOKENIZER,
+    INTENT_INDEX_DIR,
+    INTENT_EMBEDDING_CACHE_SIZE,
+    INTENT_MAX_LENGTH,
+    INTENT_TRUNCATION,
+    ENCODER_HEAD_TOKENS,
+)
+from app.services.encoder_runner import EncoderRunner
+from app.services.intent_index import IntentIndex, EmptyIntentIndex
+from app.utils.embedding_cache import EmbeddingCache
+from app.utils.file_lock import file_lock
+from app.utils.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+INTENT_SET_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
 
 class IntentService:
     """
@@ -22,6 +45,17 @@ class IntentService:
         Tokenizer associated with the pre-trained Transformer model.
     _normalizer : hazm.Normalizer
         Normalizer for preprocessing Persian text.
+    _encoder : EncoderRunner
+        Truncates the sentences and runs the model on length-bucketed batches.
+    _fingerprint : str
+        Fingerprint of the loaded encoder, stored with every saved intent index.
+    _indexes : dict
+        Persisted intent sets by name, loaded from `INTENT_INDEX_DIR`.
+    _index_stamps : dict
+        Stamp of the on-disk version of every intent set this process looked at, used to notice changes
+        made by other processes.
+    _embedding_cache : EmbeddingCache
+        Embeddings of recently seen normalized sentences.
     loaded : bool
         Flag indicating whether the model and tokenizer are loaded.
     """
@@ -33,15 +67,28 @@ class IntentService:
         self._model = None
         self._tokenizer = None
         self._normalizer = None
+        self._encoder = None
+        self._fingerprint = None
+        self._indexes = {}
+        self._index_stamps = {}
+        self._embedding_cache = EmbeddingCache(INTENT_EMBEDDING_CACHE_SIZE)
         self.loaded = False
     
     def load_model(self):
         """
-        Loads the pre-trained Transformer model, tokenizer, and normalizer.
+        Loads the pre-trained Transformer model, tokenizer, and normalizer, then the persisted intent sets.
         """
         self._model = AutoModel.from_pretrained(BERT_BASE_MODEL)
         self._tokenizer = AutoTokenizer.from_pretrained(BERT_BASE_TOKENIZER)
         self._normalizer = Normalizer()
+        self._encoder = EncoderRunner('intent', self._model, self._tokenizer, self._mean_pool, max_length=INTENT_MAX_LENGTH, truncation=INTENT_TRUNCATION)
+        self._fingerprint = self._compute_fingerprint()
+        self._embedding_cache.clear()
+        self.loaded = True
+        # Intent sets looked at before the encoder was loaded were not served and have to be loaded now
+        self._indexes = {}
+        self._index_stamps = {}
+        self.load_indexes()
     
     def get_model(self):
         """
@@ -131,7 +178,442 @@ class IntentService:
 
         return most_repeated
 
-    def intent_classifier(self, data: dict, sentence: str) -> dict:
+    def _get_representations(self, sentences: list, batch_size: int = 32, deadline: Deadline = None) -> torch.tensor:
+        """
+        Obtains mean-pooled representations of several sentences using batched forward passes.
+
+        Sentences longer than `INTENT_MAX_LENGTH` tokens are truncated with the `INTENT_TRUNCATION` policy, and
+        batches are formed from sentences of similar lengths, shared with concurrent requests. Padding tokens are excluded from the mean, so every
+        row equals `torch.mean(self._get_representation(sentence), dim=1)` for sentences within the maximum length.
+
+        Parameters:
+        ----------
+        sentences : list
+            The input sentences to be tokenized and processed.
+        batch_size : int
+            Maximum number of sentences sent through the model in a single forward pass.
+        deadline : Deadline
+            Optional deadline, checked while waiting for the forward passes.
+
+        Returns:
+        -------
+        torch.tensor
+            A tensor of shape (len(sentences), hidden_size) with one representation per sentence.
+        """
+        if not sentences:
+            return torch.empty((0, self._model.config.hidden_size))
+
+        pooled = self._encoder.run(self._encoder.encode(sentences), batch_size=batch_size, deadline=deadline)
+        return torch.stack(pooled)
+
+    def _mean_pool(self, tokens: dict) -> torch.tensor:
+        """
+        Runs the model on a padded batch and averages the hidden states of the non-padding tokens.
+        """
+        hidden = self._model(**tokens).last_hidden_state
+        mask = tokens['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+        return (hidden * mask).sum(dim=1) / mask.sum(dim=1)
+
+    def embed_sentences(self, sentences: list, deadline: Deadline = None) -> np.ndarray:
+        """
+        Embeds sentences after normalizing them, only running the model for sentences missing from the embedding cache.
+
+        Every row is the mean-pooled last hidden state of the encoder, the representation the intent classifier
+        compares. The embedding service exposes the same vectors, sharing the cache with the intent path.
+
+        Parameters:
+        ----------
+        sentences : list
+            The raw input sentences.
+        deadline : Deadline
+            Optional deadline, checked before every forward pass.
+
+        Returns:
+        -------
+        numpy.ndarray
+            A float32 matrix of shape (len(sentences), hidden_size).
+
+        Raises:
+        ------
+        ValueError:
+            If the model is not loaded.
+        """
+        if not self.loaded:
+            raise ValueError("Intent Classification Model is not loaded. Call load_model() first.")
+
+        normalized = [self._normalizer.normalize(sentence) for sentence in sentences]
+        cached = self._embedding_cache.get_many(normalized)
+        missing = list(dict.fromkeys(sentence for sentence in normalized if sentence not in cached))
+        if missing:
+            computed = {sentence: row.copy() for sentence, row in zip(missing, self._get_representations(missing, deadline=deadline).numpy())}
+            self._embedding_cache.put_many(computed)
+            cached.update(computed)
+
+        if not normalized:
+            return np.empty((0, self._model.config.hidden_size), dtype=np.float32)
+        return np.stack([cached[sentence] for sentence in normalized]).astype(np.float32, copy=False)
+
+    def _compute_fingerprint(self) -> str:
+        """
+        Computes a fingerprint identifying the encoder that produces the embeddings.
+
+        The fingerprint covers the model and tokenizer names, the truncation settings, the model configuration
+        and, when the model was downloaded from the hub, its commit hash, so a different encoder never reuses
+        stale embeddings.
+        """
+        config = self._model.config
+        parts = [
+            BERT_BASE_MODEL,
+            BERT_BASE_TOKENIZER,
+            f"{self._encoder.max_length}:{INTENT_TRUNCATION}:{ENCODER_HEAD_TOKENS}",
+            str(getattr(config, '_commit_hash', None)),
+            config.to_json_string(use_diff=False),
+        ]
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+    def build_index(self, data: dict, deadline: Deadline = None) -> IntentIndex:
+        """
+        Embeds the example sentences of an intent set.
+
+        The resulting index can be reused with `classify_batch` to classify any number of sentences
+        against the same intent set without embedding its examples again, and saved with `save_index`.
+
+        Parameters:
+        ----------
+        data : dict
+            A dictionary where keys are intent labels and values are lists of example sentences.
+        deadline : Deadline
+            Optional deadline, checked before every forward pass.
+
+        Returns:
+        -------
+        IntentIndex
+            The embedded intent set.
+        """
+        sentences = []
+        example_labels = []
+        for label_index, key in enumerate(data.keys()):
+            for sent in data[key]:
+                sentences.append(sent)
+                example_labels.append(label_index)
+        embeddings = self.embed_sentences(sentences, deadline)
+        return IntentIndex(list(data.keys()), sentences, embeddings, np.array(example_labels, dtype=np.int32), self._fingerprint)
+
+    def _index_path(self, name: str) -> str:
+        if not INTENT_SET_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid intent set name: {name}")
+        return os.path.join(INTENT_INDEX_DIR, name)
+
+    def _lock_path(self, name: str) -> str:
+        return os.path.join(INTENT_INDEX_DIR, f".{name}.lock")
+
+    def _index_names(self) -> list:
+        if not os.path.isdir(INTENT_INDEX_DIR):
+            return []
+        return sorted(name for name in os.listdir(INTENT_INDEX_DIR) if INTENT_SET_NAME_PATTERN.match(name))
+
+    def _disk_stamp(self, name: str):
+        """
+        Returns a stamp identifying the on-disk version of an intent set, or None if it does not exist.
+
+        Every save writes a new `meta.json` file, so its inode and modification time change with every version.
+        """
+        try:
+            stat = os.stat(os.path.join(INTENT_INDEX_DIR, name, IntentIndex.META_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _reload_index(self, name: str):
+        """
+        Brings the served copy of an intent set up to date with its files. The caller holds its lock file.
+
+        Raises:
+        ------
+        ValueError:
+            If the model is not loaded, since the fingerprint of the intent set cannot be checked yet.
+        """
+        if not self.loaded:
+            raise ValueError("Intent Classification Model is not loaded. Call load_model() first.")
+        stamp = self._disk_stamp(name)
+        if stamp is not None and stamp == self._index_stamps.get(name):
+            return
+
+        self._indexes.pop(name, None)
+        self._index_stamps[name] = stamp
+        if stamp is None:
+            return
+
+        path = self._index_path(name)
+        try:
+            if IntentIndex.read_fingerprint(path) != self._fingerprint:
+                logger.warning(f"Intent set {name} was built with a different encoder and is not served. "
+                               f"Re-embed it with `python -m app.cli.build_intent_index --rebuild-stale`.")
+                return
+            self._indexes[name] = IntentIndex.load(path, mmap=True)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Could not load intent set {name}: {e}")
+
+    def _sync_index(self, name: str):
+        """
+        Reloads an intent set if another process changed, created or deleted it.
+        """
+        if self._disk_stamp(name) == self._index_stamps.get(name):
+            return
+        # Files are only read under the lock, so a concurrent save is never observed half-way
+        with file_lock(self._lock_path(name)):
+            self._reload_index(name)
+
+    def load_indexes(self):
+        """
+        Loads every persisted intent set from `INTENT_INDEX_DIR` with memory mapping.
+
+        Intent sets built with a different encoder are not served; they are logged and have to be re-embedded
+        offline with `python -m app.cli.build_intent_index --rebuild-stale`. Intent sets that cannot be read
+        are logged and skipped as well.
+        """
+        for name in self._index_names():
+            self._sync_index(name)
+
+    def rebuild_stale_indexes(self) -> list:
+        """
+        Re-embeds the persisted intent sets built with a different encoder from their stored sentences.
+
+        Returns:
+        -------
+        list
+            The names of the re-embedded intent sets.
+        """
+        rebuilt = []
+        for name in self._index_names():
+            path = os.path.join(INTENT_INDEX_DIR, name)
+            with file_lock(self._lock_path(name)):
+                # Another process may have rebuilt or deleted the intent set while this one waited for the lock
+                if self._disk_stamp(name) is None or IntentIndex.read_fingerprint(path) == self._fingerprint:
+                    continue
+                logger.info(f"Re-embedding intent set {name}")
+                self._write_index(name, self.build_index(IntentIndex.load(path).to_data()))
+                rebuilt.append(name)
+        return rebuilt
+
+    def _write_index(self, name: str, index: IntentIndex):
+        if index.fingerprint != self._fingerprint:
+            raise ValueError(f"Intent set {name} was built with a different encoder.")
+        path = self._index_path(name)
+        index.save(path)
+        loaded = IntentIndex.load(path, mmap=True)
+        loaded._squared_norms = index._squared_norms
+        self._indexes[name] = loaded
+        self._index_stamps[name] = self._disk_stamp(name)
+        return loaded
+
+    def save_index(self, name: str, index: IntentIndex):
+        """
+        Persists an intent set under the given name and serves it from its memory-mapped files.
+
+        Writes of the same intent set are serialized across processes with a lock file in `INTENT_INDEX_DIR`.
+
+        Parameters:
+        ----------
+        name : str
+            Name of the intent set, made of letters, digits, '_' and '-'.
+        index : IntentIndex
+            The embedded intent set.
+
+        Raises:
+        ------
+        ValueError:
+            If the name is invalid or the index was built with a different encoder.
+        """
+        self._index_path(name)
+        with file_lock(self._lock_path(name)):
+            return self._write_index(name, index)
+
+    def get_index(self, name: str) -> IntentIndex:
+        """
+        Returns the current version of a persisted intent set, reloading it if another process changed it.
+
+        Raises:
+        ------
+        KeyError:
+            If no intent set with the given name exists.
+        ValueError:
+            If the model is not loaded.
+        """
+        if not INTENT_SET_NAME_PATTERN.match(name):
+            raise KeyError(name)
+        self._sync_index(name)
+        return self._indexes[name]
+
+    def list_indexes(self) -> dict:
+        """
+        Returns the current versions of the persisted intent sets by name.
+
+        Raises:
+        ------
+        ValueError:
+            If the model is not loaded.
+        """
+        names = self._index_names()
+        for name in set(names) | set(self._index_stamps):
+            self._sync_index(name)
+        return {name: self._indexes[name] for name in names if name in self._indexes}
+
+    def create_intent_set(self, name: str, data: dict) -> IntentIndex:
+        """
+        Creates or replaces a persisted intent set. Sentences found in the embedding cache are not embedded again.
+
+        Parameters:
+        ----------
+        name : str
+            Name of the intent set.
+        data : dict
+            A dictionary where keys are intent labels and values are lists of example sentences.
+
+        Returns:
+        -------
+        IntentIndex
+            The persisted intent set.
+
+        Raises:
+        ------
+        ValueError:
+            If the name is invalid, checked before any sentence is embedded.
+        """
+        self._index_path(name)
+        return self.save_index(name, self.build_index(data))
+
+    def delete_intent_set(self, name: str):
+        """
+        Deletes a persisted intent set.
+
+        Raises:
+        ------
+        KeyError:
+            If no intent set with the given name exists.
+        ValueError:
+            If the name is invalid or the model is not loaded.
+        """
+        path = self._index_path(name)
+        with file_lock(self._lock_path(name)):
+            self._reload_index(name)
+            if self._index_stamps.get(name) is None:
+                raise KeyError(name)
+            shutil.rmtree(path)
+            self._indexes.pop(name, None)
+            self._index_stamps[name] = None
+
+    def _update_intent_set(self, name: str, update) -> IntentIndex:
+        """
+        Applies an edit to the latest on-disk version of an intent set and saves the result.
+
+        The read, the edit and the write happen under the intent set's lock file, so concurrent edits from
+        other processes and threads are applied one after the other instead of overwriting each other, while
+        edits of other intent sets go ahead.
+        """
+        self._index_path(name)
+        with file_lock(self._lock_path(name)):
+            self._reload_index(name)
+            if name not in self._indexes:
+                raise KeyError(name)
+            return self._write_index(name, update(self._indexes[name]))
+
+    def add_examples(self, name: str, label: str, sentences: list) -> IntentIndex:
+        """
+        Adds example sentences to a label of a persisted intent set, creating the label if needed.
+
+        Only the new sentences are embedded; sentences the label already has are ignored.
+
+        Raises:
+        ------
+        KeyError:
+            If no intent set with the given name exists.
+        """
+        def update(index):
+            existing = set(index.to_data().get(label, []))
+            new_sentences = [sentence for sentence in dict.fromkeys(sentences) if sentence not in existing]
+            return index.add_examples(label, new_sentences, self.embed_sentences(new_sentences))
+        return self._update_intent_set(name, update)
+
+    def remove_examples(self, name: str, label: str, sentences: list) -> IntentIndex:
+        """
+        Removes example sentences from a label of a persisted intent set.
+
+        Raises:
+        ------
+        KeyError:
+            If the intent set or the label does not exist.
+        """
+        return self._update_intent_set(name, lambda index: index.remove_examples(label, sentences))
+
+    def rename_label(self, name: str, label: str, new_label: str) -> IntentIndex:
+        """
+        Renames a label of a persisted intent set.
+
+        Raises:
+        ------
+        KeyError:
+            If the intent set or the label does not exist.
+        ValueError:
+            If the new label already exists.
+        """
+        return self._update_intent_set(name, lambda index: index.rename_label(label, new_label))
+
+    def remove_label(self, name: str, label: str) -> IntentIndex:
+        """
+        Removes a label and all of its examples from a persisted intent set.
+
+        Raises:
+        ------
+        KeyError:
+            If the intent set or the label does not exist.
+        """
+        return self._update_intent_set(name, lambda index: index.remove_label(label))
+
+    def classify_batch(self, index: IntentIndex, sentences: list, k: int = 3, deadline: Deadline = None) -> list:
+        """
+        Classifies several sentences against an embedded intent set.
+
+        Parameters:
+        ----------
+        index : IntentIndex
+            The embedded intent set, as returned by `build_index` or `get_index`.
+        sentences : list
+            The input sentences to classify.
+        k : int
+            Number of nearest neighbors used for the majority vote.
+        deadline : Deadline
+            Optional deadline, checked before every forward pass.
+
+        Returns:
+        -------
+        list
+            One dictionary per sentence with indices, values of the nearest neighbors, the majority class and
+            its label. Label indices are positions in `index.labels` and change when labels are removed, the
+            label name does not.
+
+        Raises:
+        ------
+        EmptyIntentIndex:
+            If the intent set has no examples.
+        """
+        if len(index) == 0:
+            raise EmptyIntentIndex("Intent set has no examples.")
+        targets = self.embed_sentences(sentences, deadline)
+        distances, indices = index.search(targets, k)
+        results = []
+        for row_distances, row_indices in zip(distances, indices):
+            classes = torch.from_numpy(index.example_labels[row_indices].astype(np.int64))
+            majority_class = self._most_repeated_element(classes)
+            results.append({
+                'Indices': classes.tolist(),
+                'Values': row_distances.tolist(),
+                'Majority Class': majority_class,
+                'Label': index.labels[majority_class],
+            })
+        return results
+
+    def intent_classifier(self, data: dict, sentence: str, deadline: Deadline = None) -> dict:
         """
         Classifies the intent of the given sentence based on the provided training data.
 
@@ -143,31 +625,37 @@ class IntentService:
         sentence : str
             The input sentence to classify.
             Example: "برای من یک کشک بادمجون سفارش بده"
+        deadline : Deadline
+            Optional deadline, checked before every forward pass.
 
         Returns:
         -------
         dict
             A dictionary with indices, values of the nearest neighbors, and the majority class.
         """
-        data_points = []
-        distinct_data_points = {}
-        sentiment_points = []
-        for key in data.keys():
-            sentiment_points.append(self._get_representation(key))
-            tmp = []
-            sentences = data[key]
-            for sent in sentences:
-                tmp.append(torch.mean(self._get_representation(self._normalizer.normalize(sent)), dim=1))
-            data_points += tmp
-            distinct_data_points[key] = tmp
-        
-        target_rep = torch.mean(self._get_representation(self._normalizer.normalize(sentence)), dim=1)
-        points = torch.concat(data_points, dim=0)
-        dist = torch.norm(points - target_rep, dim=1, p=None)
-        knn = dist.topk(3, largest=False)
-        print({'Indices': torch.floor(knn.indices / len(sentiment_points)).tolist(), 'Values': knn.values.tolist(), 'Majority Class': self._most_repeated_element(torch.floor(knn.indices / len(sentiment_points)))})
-        return {'Indices': torch.floor(knn.indices / len(sentiment_points)).tolist(), 'Values': knn.values.tolist(), 'Majority Class': self._most_repeated_element(torch.floor(knn.indices / len(sentiment_points)))}
-        
+        return self.classify_batch(self.build_index(data, deadline), [sentence], deadline=deadline)[0]
 
+    def intent_classifier_batch(self, data: dict, sentences: list, k: int = 3, deadline: Deadline = None) -> list:
+        """
+        Classifies several sentences against the same training data in a single call.
 
+        The examples are embedded once, the sentences are embedded together in batched forward passes, and
+        the nearest neighbors of all sentences are found with one sentences x examples distance computation.
 
+        Parameters:
+        ----------
+        data : dict
+            A dictionary where keys are intent labels and values are lists of example sentences.
+        sentences : list
+            The input sentences to classify.
+        k : int
+            Number of nearest neighbors used for the majority vote.
+        deadline : Deadline
+            Optional deadline, checked before every forward pass.
+
+        Returns:
+        -------
+        list
+            One dictionary per sentence with indices, values of the nearest neighbors, and the majority class.
+        """
+        return self.classify_batch(self.build_index(data, deadline), sentences, k=k, deadline=deadline)
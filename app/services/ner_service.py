@@ -1,14 +1,113 @@
-from transformers import AutoModelForTokenClassification, AutoTokenizer, pipeline
+import numpy as np
+from transformers import AutoModelForTokenClassification, AutoTokenizer
 from hazm import Normalizer
 from app.services.transformers_service import TransformersService
-from app.config.settings import NER_MODEL_NAME
+from app.services.encoder_runner import EncoderRunner
+from app.config.settings import NER_MODEL_NAME, NER_MAX_LENGTH, NER_TRUNCATION
+from app.utils.deadline import Deadline
+
+ENTITY_TYPES = ('organization', 'money', 'location', 'person', 'time', 'date', 'percent')
+
+
+def build_label_table(id2label: dict) -> tuple:
+    """
+    Converts the model's label names into lookup arrays indexed by label id.
+
+    Parameters:
+    ----------
+    id2label : dict
+        Mapping from label id to label name, such as {1: 'B-person', 2: 'I-person', ...}.
+
+    Returns:
+    -------
+    tuple
+        A `(entity_types, begins)` pair of arrays. `entity_types[label_id]` is the position of the label's entity
+        type in `ENTITY_TYPES`, or -1 for labels outside of it, and `begins[label_id]` tells whether the label is a B- label.
+    """
+    size = max(id2label) + 1
+    entity_types = np.full(size, -1, dtype=np.int64)
+    begins = np.zeros(size, dtype=bool)
+    for label_id, label in id2label.items():
+        prefix, _, entity_type = label.partition('-')
+        if entity_type in ENTITY_TYPES:
+            entity_types[label_id] = ENTITY_TYPES.index(entity_type)
+            begins[label_id] = prefix == 'B'
+    return entity_types, begins
+
+
+def aggregate_entities(text: str, label_ids: np.ndarray, offsets: np.ndarray, entity_types: np.ndarray, begins: np.ndarray) -> dict:
+    """
+    Builds full entity names from the predicted label ids of one text.
+
+    Entity boundaries are computed on the label id arrays with the grouping rules of the former pipeline-based
+    implementation: a B- token starts an entity, which collects the following I- tokens of the same type until
+    the next B- token. O tokens and I- tokens of another type are skipped without closing the entity, and I- tokens
+    before any entity of their type are dropped. A B- word piece glued to a token of the same entity continues it
+    instead of starting an entity made of a lone word piece.
+
+    Every run of adjacent tokens of an entity is a single slice of the input text, and runs separated by skipped
+    tokens are joined with a space, so no per-token objects are created.
+
+    Parameters:
+    ----------
+    text : str
+        The text the tokenizer ran on.
+    label_ids : numpy.ndarray
+        Predicted label id of every token.
+    offsets : numpy.ndarray
+        Character offsets of every token as an array of shape (tokens, 2); special and padding tokens are (0, 0).
+    entity_types : numpy.ndarray
+        Entity type lookup array from `build_label_table`.
+    begins : numpy.ndarray
+        B- label lookup array from `build_label_table`.
+
+    Returns:
+    -------
+    dict
+        A dictionary where the keys are entity types (e.g., 'organization', 'money') and the values are lists of recognized entities.
+    """
+    entity_groups = {entity_type: [] for entity_type in ENTITY_TYPES}
+
+    types = entity_types[label_ids]
+    starts = offsets[:, 0]
+    ends = offsets[:, 1]
+    valid = (types >= 0) & (ends > starts)
+
+    glued = np.zeros(len(types), dtype=bool)
+    glued[1:] = valid[1:] & valid[:-1] & (types[1:] == types[:-1]) & (starts[1:] == ends[:-1])
+    is_begin = valid & begins[label_ids] & ~glued
+
+    # Every token belongs to the entity started by the last B- token before it, 0 meaning no entity yet
+    entity_ids = np.cumsum(is_begin)
+    if not entity_ids.size or not entity_ids[-1]:
+        return entity_groups
+    current_types = np.append(-1, types[is_begin])[entity_ids]
+    members = np.flatnonzero(valid & (types == current_types))
+
+    member_entities = entity_ids[members]
+    new_runs = np.ones(len(members), dtype=bool)
+    new_runs[1:] = (member_entities[1:] != member_entities[:-1]) | (members[1:] != members[:-1] + 1)
+    run_starts = members[new_runs].tolist()
+    run_ends = members[np.append(new_runs[1:], True)].tolist()
+    run_entities = member_entities[new_runs].tolist()
+
+    entity_type, parts, last_entity = None, [], None
+    for first, last, entity_id in zip(run_starts, run_ends, run_entities):
+        if entity_id != last_entity:
+            if parts:
+                entity_groups[entity_type].append(' '.join(parts))
+            entity_type, parts, last_entity = ENTITY_TYPES[types[first]], [], entity_id
+        parts.append(text[starts[first]:ends[last]])
+    entity_groups[entity_type].append(' '.join(parts))
+    return entity_groups
+
 
 class NERService:
     """
     Service for Named Entity Recognition (NER) in Persian language using pre-trained Transformer models.
 
-    This service utilizes a pre-trained Transformer model to perform NER on Persian text, identifying entities such as 
-    organizations, money, locations, persons, time, date, and percent. The service normalizes the input text, tokenizes it, 
+    This service utilizes a pre-trained Transformer model to perform NER on Persian text, identifying entities such as
+    organizations, money, locations, persons, time, date, and percent. The service normalizes the input text, tokenizes it,
     and processes it through the model to extract entities.
 
     Attributes:
@@ -17,19 +116,24 @@ class NERService:
         A service for handling the loading and management of the Transformer model and tokenizer.
     normalizer : hazm.Normalizer
         Normalizer for preprocessing Persian text.
-    ner_pipeline : pipeline
-        The Hugging Face pipeline for performing NER.
+    _label_table : tuple
+        Entity type and B- label lookup arrays indexed by label id, built from the model configuration.
+    _encoder : EncoderRunner
+        Truncates the texts and runs the model on length-bucketed batches.
 
     Methods:
     -------
     __init__():
         Initializes the NERService instance with the required model, tokenizer, and normalizer.
-    
+
     load_model():
         Loads the pre-trained NER model and tokenizer.
 
-    get_full_entity_names(text: str):
+    get_full_entity_names(text: str, deadline: Deadline = None):
         Processes the input text to extract named entities and returns them grouped by entity types.
+
+    get_full_entity_names_batch(texts: list, deadline: Deadline = None):
+        Processes several texts in batched forward passes and returns their grouped entities.
     """
     def __init__(self):
         """
@@ -39,7 +143,8 @@ class NERService:
         """
         self.bert_service = TransformersService(model=AutoModelForTokenClassification, tokenizer=AutoTokenizer, model_name_or_path=NER_MODEL_NAME)
         self.normalizer = Normalizer()
-        self.ner_pipeline = None
+        self._label_table = None
+        self._encoder = None
 
     def load_model(self):
         """
@@ -48,64 +153,79 @@ class NERService:
         This method calls the `load_model` method of `TransformersService` to load the pre-trained model and tokenizer for NER.
         """
         self.bert_service.load_model()
+        model = self.bert_service.get_model()
+        self._label_table = build_label_table(model.config.id2label)
+        self._encoder = EncoderRunner('ner', model, self.bert_service.get_tokenizer(),
+                                      lambda tokens: model(**tokens).logits.argmax(dim=-1).numpy(),
+                                      max_length=NER_MAX_LENGTH, truncation=NER_TRUNCATION)
 
-    def get_full_entity_names(self, text: str):
+    def get_full_entity_names(self, text: str, deadline: Deadline = None):
         """
         Processes the input text to extract named entities and returns them grouped by entity types.
 
-        This method normalizes the input text, processes it through the NER model, and groups the recognized entities by type. 
+        This method normalizes the input text, processes it through the NER model, and groups the recognized entities by type.
         It supports entities like organization, money, location, person, time, date, and percent.
 
         Parameters:
         ----------
         text : str
             The input text to be processed for named entity recognition.
+        deadline : Deadline
+            Optional deadline, checked before the forward pass.
 
         Returns:
         -------
         dict
             A dictionary where the keys are entity types (e.g., 'organization', 'money') and the values are lists of recognized entities.
-        
+
         Raises:
         ------
         ValueError:
             If the model is not loaded before calling this method.
+        DeadlineExceeded:
+            If the deadline passed or the request was cancelled.
         """
-        if not self.bert_service.loaded:
-            raise ValueError("Model not loaded. Call load_model() first. NER_SERVICE")
+        return self.get_full_entity_names_batch([text], deadline=deadline)[0]
 
-        if self.ner_pipeline is None:
-            self.ner_pipeline = pipeline("ner", model=self.bert_service.get_model(), tokenizer=self.bert_service.get_tokenizer())
+    def get_full_entity_names_batch(self, texts: list, batch_size: int = 16, deadline: Deadline = None):
+        """
+        Processes several texts in batched forward passes and returns their named entities grouped by entity types.
 
-        entity_groups = {
-            'organization': [],
-            'money': [],
-            'location': [],
-            'person': [],
-            'time': [],
-            'date': [],
-            'percent': []
-        }
+        Texts longer than `NER_MAX_LENGTH` tokens are truncated with the `NER_TRUNCATION` policy, so entities in
+        the dropped part are not reported. Batches are formed from texts of similar lengths, shared with concurrent requests.
 
-        current_entity_words = None
-        current_entity_type = None
+        Parameters:
+        ----------
+        texts : list
+            The input texts to be processed for named entity recognition.
+        batch_size : int
+            Maximum number of texts sent through the model in a single forward pass.
+        deadline : Deadline
+            Optional deadline, checked while waiting for the forward passes.
 
-        normalized_text = self.normalizer.normalize(text)
+        Returns:
+        -------
+        list
+            One dictionary per input text, shaped like the output of `get_full_entity_names`.
 
-        for entity in self.ner_pipeline(normalized_text):
-            entity_label = entity['entity']
-            entity_type = entity_label.split('-')[1] if '-' in entity_label else None
+        Raises:
+        ------
+        ValueError:
+            If the model is not loaded before calling this method.
+        DeadlineExceeded:
+            If the deadline passed or the request was cancelled.
+        """
+        # The encoder is set up last, after the model reports loaded
+        if self._encoder is None:
+            raise ValueError("Model not loaded. Call load_model() first. NER_SERVICE")
 
-            if entity_type in entity_groups:
-                if 'B-' in entity_label:
-                    if current_entity_words is not None:
-                        entity_groups[current_entity_type].append(current_entity_words.replace(' ##', '').strip())
-                    current_entity_words = entity['word']
-                    current_entity_type = entity_type
-                elif 'I-' in entity_label and current_entity_type == entity_type:
-                    current_entity_words += ' ' + entity['word'].replace(' ##', '')
+        entity_types, begins = self._label_table
 
-        if current_entity_words is not None:
-            entity_groups[current_entity_type].append(current_entity_words.strip())
+        normalized_texts = [self.normalizer.normalize(text) for text in texts]
+        encodings = self._encoder.encode(normalized_texts, offsets=True)
+        label_ids = self._encoder.run(encodings, batch_size=batch_size, deadline=deadline)
 
-        return entity_groups
+        results = []
+        for normalized_text, (_, offsets), row_label_ids in zip(normalized_texts, encodings, label_ids):
+            results.append(aggregate_entities(normalized_text, row_label_ids[:len(offsets)], offsets, entity_types, begins))
+        return results
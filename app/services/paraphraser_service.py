@@ -1,6 +1,17 @@
 from app.models.paraphraser import ParaphraseModel
-from transformers import T5Tokenizer
+from transformers import T5Tokenizer, StoppingCriteria, StoppingCriteriaList
 from app.config.settings import PARAPHRASER_MODEL_NAME, PARAPHRASER_MODEL_PATH
+from app.utils.deadline import Deadline
+
+class DeadlineStoppingCriteria(StoppingCriteria):
+    """
+    Stops generation between decoder steps once the request deadline passed or the request was cancelled.
+    """
+    def __init__(self, deadline: Deadline):
+        self.deadline = deadline
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.deadline.expired
 
 class ParaphraseService:
     """
@@ -32,8 +43,11 @@ class ParaphraseService:
     get_tokenizer():
         Returns the loaded tokenizer, raises an error if the tokenizer is not loaded.
 
-    paraphrase(text: str):
+    paraphrase(text: str, deadline: Deadline = None):
         Generates a paraphrase of the given text using the pre-trained model.
+
+    paraphrase_batch(texts: list, deadline: Deadline = None):
+        Generates one paraphrase per text using a single batched generation call.
     """
     def __init__(self):
         """
@@ -83,7 +97,12 @@ class ParaphraseService:
             raise ValueError("Tokenizer not loaded. Call load_model() first.")
         return self._tokenizer
 
-    def paraphrase(self, text: str):
+    def _stopping_criteria(self, deadline: Deadline):
+        if deadline is None:
+            return None
+        return StoppingCriteriaList([DeadlineStoppingCriteria(deadline)])
+
+    def paraphrase(self, text: str, deadline: Deadline = None):
         """
         Generates a paraphrase of the given text using the pre-trained model.
 
@@ -93,6 +112,8 @@ class ParaphraseService:
         ----------
         text : str
             The input text to be paraphrased.
+        deadline : Deadline
+            Optional deadline, checked between decoder steps.
 
         Returns:
         -------
@@ -103,6 +124,8 @@ class ParaphraseService:
         ------
         ValueError:
             If the model or tokenizer is not loaded before calling this method.
+        DeadlineExceeded:
+            If the deadline passed or the request was cancelled during generation.
         """
         model = self.get_model()
         tokenizer = self.get_tokenizer()
@@ -116,17 +139,88 @@ class ParaphraseService:
             return_tensors="pt"
         )
 
+        if deadline is not None:
+            deadline.check()
+
         generated_ids = model.model.generate(
             input_ids=text_encoding["input_ids"],
             attention_mask=text_encoding["attention_mask"],
             max_length=512,
             num_beams=2,
-            early_stopping=True
+            early_stopping=True,
+            stopping_criteria=self._stopping_criteria(deadline)
         )
 
+        # Generation returns early when the deadline stops it, so the partial output is discarded
+        if deadline is not None:
+            deadline.check()
+
         preds = [
             tokenizer.decode(gen_id, skip_special_tokens=True, clean_up_tokenization_spaces=True)
             for gen_id in generated_ids
         ]
 
         return "".join(preds)
+
+    def paraphrase_batch(self, texts: list, deadline: Deadline = None):
+        """
+        Generates one paraphrase per input text using a single batched generation call.
+
+        Inputs are truncated to 90 tokens, the length the model was fine-tuned on, and padded to the longest
+        input of the batch.
+
+        Parameters:
+        ----------
+        texts : list
+            The input texts to be paraphrased.
+        deadline : Deadline
+            Optional deadline, checked between decoder steps.
+
+        Returns:
+        -------
+        list
+            The paraphrased texts, in the same order as the inputs.
+
+        Raises:
+        ------
+        ValueError:
+            If the model or tokenizer is not loaded before calling this method.
+        DeadlineExceeded:
+            If the deadline passed or the request was cancelled during generation.
+        """
+        model = self.get_model()
+        tokenizer = self.get_tokenizer()
+
+        if not texts:
+            return []
+
+        text_encoding = tokenizer(
+            texts,
+            max_length=90,
+            padding='longest',
+            truncation=True,
+            return_attention_mask=True,
+            add_special_tokens=True,
+            return_tensors="pt"
+        )
+
+        if deadline is not None:
+            deadline.check()
+
+        generated_ids = model.model.generate(
+            input_ids=text_encoding["input_ids"],
+            attention_mask=text_encoding["attention_mask"],
+            max_length=512,
+            num_beams=2,
+            early_stopping=True,
+            stopping_criteria=self._stopping_criteria(deadline)
+        )
+
+        # Generation returns early when the deadline stops it, so the partial output is discarded
+        if deadline is not None:
+            deadline.check()
+
+        return [
+            tokenizer.decode(gen_id, skip_special_tokens=True, clean_up_tokenization_spaces=True)
+            for gen_id in generated_ids
+        ]
@@ -0,0 +1,275 @@
+import asyncio
+import itertools
+import threading
+from contextlib import asynccontextmanager
+
+from app.config.settings import (
+    INTENT_CHARS_PER_TOKEN,
+    INTENT_MAX_QUERIES,
+    INTENT_MAX_LABELS,
+    INTENT_MAX_EXAMPLES,
+    INTENT_MAX_SENTENCE_LENGTH,
+    INTENT_MAX_REQUEST_COST,
+    INTENT_MAX_CONCURRENCY,
+    INTENT_MAX_QUEUED_COST,
+    INTENT_MAX_CLIENT_QUEUED_COST,
+    INTENT_CLIENT_WEIGHTS,
+    ADMISSION_POLL_INTERVAL,
+)
+from app.utils.deadline import Deadline
+from app.utils.stats import Stats
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is refused before any model work starts.
+
+    Attributes:
+    ----------
+    status_code : int
+        HTTP status reported to the client: 413 for oversized payloads, 429 when the client's own queue is full
+        and 503 when the service queue is full.
+    detail : str
+        Human readable reason.
+    """
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _too_large(detail: str) -> AdmissionRejected:
+    Stats.increment("admission.intent.rejected.too_large")
+    return AdmissionRejected(413, detail)
+
+
+def estimate_tokens(sentence: str) -> int:
+    """
+    Cheaply estimates the number of encoder tokens of a sentence, including the [CLS] and [SEP] tokens.
+    """
+    return len(sentence) // INTENT_CHARS_PER_TOKEN + 2
+
+
+def intent_request_cost(queries: list, data: dict = None) -> int:
+    """
+    Estimates the cost of an intent request and enforces the per-request payload limits.
+
+    Every sentence is embedded with one forward pass row, so the cost is the estimated number of tokens summed
+    over the queries and, for requests sending their own training data, over every example sentence.
+
+    Parameters:
+    ----------
+    queries : list
+        The sentences to classify.
+    data : dict
+        A dictionary where keys are intent labels and values are lists of example sentences, or None for
+        requests classifying against a persisted intent set.
+
+    Returns:
+    -------
+    int
+        The estimated cost in tokens.
+
+    Raises:
+    ------
+    AdmissionRejected:
+        If the payload exceeds one of the configured limits.
+    """
+    if len(queries) > INTENT_MAX_QUERIES:
+        raise _too_large(f"Too many queries: {len(queries)} > {INTENT_MAX_QUERIES}")
+
+    sentences = list(queries)
+    if data is not None:
+        if len(data) > INTENT_MAX_LABELS:
+            raise _too_large(f"Too many intent labels: {len(data)} > {INTENT_MAX_LABELS}")
+        for examples in data.values():
+            sentences += examples
+        if len(sentences) - len(queries) > INTENT_MAX_EXAMPLES:
+            raise _too_large(f"Too many intent examples: {len(sentences) - len(queries)} > {INTENT_MAX_EXAMPLES}")
+
+    cost = 0
+    for sentence in sentences:
+        if len(sentence) > INTENT_MAX_SENTENCE_LENGTH:
+            raise _too_large(f"Sentence longer than {INTENT_MAX_SENTENCE_LENGTH} characters")
+        cost += estimate_tokens(sentence)
+
+    if cost > INTENT_MAX_REQUEST_COST:
+        raise _too_large(f"Request too expensive: estimated {cost} tokens > {INTENT_MAX_REQUEST_COST}")
+    return cost
+
+
+def api_key_client(api_key: str) -> str:
+    """
+    Returns the client key of a request authenticated with the given API key.
+    """
+    return f"key:{api_key}"
+
+
+def host_client(host: str) -> str:
+    """
+    Returns the client key of a request sent without an API key from the given address.
+    """
+    return f"host:{host}"
+
+
+class _Ticket:
+    def __init__(self, client: str, cost: int, finish: float, seq: int):
+        self.client = client
+        self.cost = cost
+        self.finish = finish
+        self.seq = seq
+        self.granted = False
+        self.event = asyncio.Event()
+
+
+class FairScheduler:
+    """
+    Weighted fair admission of costly requests across clients.
+
+    At most `capacity` requests run at once. Waiting requests are ordered by start-time fair queueing: every
+    request gets a virtual finish tag of `max(virtual time, client's previous finish tag) + cost / weight`, and
+    the smallest tag runs first. A client sending heavy payloads therefore pushes its own later requests back
+    without delaying light requests of other clients.
+
+    Requests wait on the event loop, not in a worker thread, so any number of queued requests leaves the
+    threadpool free for other routes. Only admitted requests should hand their model work to the threadpool.
+
+    Attributes:
+    ----------
+    name : str
+        Name used for the admission counters.
+    capacity : int
+        Maximum number of requests running at once.
+    max_queued_cost : int
+        Maximum total cost waiting in the queue before new requests are rejected with 503.
+    max_client_queued_cost : int
+        Maximum cost a single client may have waiting before its new requests are rejected with 429.
+    weights : dict
+        Weight of each client key, as returned by the `client_key` dependency, 1 for clients that are not listed.
+    """
+    def __init__(self, name: str, capacity: int, max_queued_cost: int, max_client_queued_cost: int, weights: dict = None):
+        self.name = name
+        self.capacity = capacity
+        self.max_queued_cost = max_queued_cost
+        self.max_client_queued_cost = max_client_queued_cost
+        self.weights = weights or {}
+        self._lock = threading.Lock()
+        self._waiting = []
+        self._running = 0
+        self._virtual_time = 0.0
+        self._last_finish = {}
+        self._queued_cost = {}
+        self._seq = itertools.count()
+
+    @asynccontextmanager
+    async def admit(self, client: str, cost: int, deadline: Deadline = None):
+        """
+        Waits until the request may run and holds its slot for the duration of the `async with` block.
+
+        Parameters:
+        ----------
+        client : str
+            Key identifying the client, such as its API key.
+        cost : int
+            Estimated cost of the request.
+        deadline : Deadline
+            Optional deadline; waiting stops as soon as it passes or the request is cancelled.
+
+        Raises:
+        ------
+        AdmissionRejected:
+            If the client's queue or the service queue is full.
+        DeadlineExceeded:
+            If the deadline passes while the request is waiting.
+        """
+        ticket = self._enqueue(client, cost)
+        try:
+            await self._wait(ticket, deadline)
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        Stats.increment(f"admission.{self.name}.admitted")
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _enqueue(self, client: str, cost: int) -> _Ticket:
+        with self._lock:
+            client_cost = self._queued_cost.get(client, 0)
+            total_cost = sum(self._queued_cost.values())
+            if self._waiting and client_cost + cost > self.max_client_queued_cost:
+                Stats.increment(f"admission.{self.name}.rejected.client_queue_full")
+                raise AdmissionRejected(429, "Too many pending requests for this client")
+            if self._waiting and total_cost + cost > self.max_queued_cost:
+                Stats.increment(f"admission.{self.name}.rejected.queue_full")
+                raise AdmissionRejected(503, "Service is overloaded, retry later")
+
+            # Clients whose last finish tag is behind the virtual time are idle and start from the virtual time anyway
+            self._last_finish = {key: tag for key, tag in self._last_finish.items() if tag > self._virtual_time}
+            start = max(self._virtual_time, self._last_finish.get(client, 0.0))
+            finish = start + cost / self.weights.get(client, 1)
+            self._last_finish[client] = finish
+            ticket = _Ticket(client, cost, finish, next(self._seq))
+
+            self._waiting.append(ticket)
+            self._queued_cost[client] = client_cost + cost
+            self._dispatch()
+            return ticket
+
+    async def _wait(self, ticket: _Ticket, deadline: Deadline):
+        while not ticket.granted:
+            if deadline is not None:
+                deadline.check()
+            # Wake up regularly so deadlines and client disconnects are noticed while waiting
+            try:
+                await asyncio.wait_for(ticket.event.wait(), ADMISSION_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self):
+        while self._running < self.capacity and self._waiting:
+            ticket = min(self._waiting, key=lambda waiting: (waiting.finish, waiting.seq))
+            self._waiting.remove(ticket)
+            self._dequeued(ticket)
+            self._virtual_time = max(self._virtual_time, ticket.finish - ticket.cost / self.weights.get(ticket.client, 1))
+            ticket.granted = True
+            ticket.event.set()
+            self._running += 1
+
+    def _dequeued(self, ticket: _Ticket):
+        remaining = self._queued_cost[ticket.client] - ticket.cost
+        if remaining:
+            self._queued_cost[ticket.client] = remaining
+        else:
+            del self._queued_cost[ticket.client]
+
+    def _abandon(self, ticket: _Ticket):
+        with self._lock:
+            if ticket.granted:
+                self._running -= 1
+            else:
+                self._waiting.remove(ticket)
+                self._dequeued(ticket)
+            self._dispatch()
+
+    def _release(self):
+        with self._lock:
+            self._running -= 1
+            self._dispatch()
+
+
+class IntentScheduler(FairScheduler):
+    """
+    Fair scheduler for intent classification requests, configured from `app/config/settings.py`.
+
+    `INTENT_CLIENT_WEIGHTS` maps raw API keys, as sent in the `CLIENT_KEY_HEADER` header, to weights.
+    """
+    def __init__(self):
+        super().__init__(
+            'intent',
+            capacity=INTENT_MAX_CONCURRENCY,
+            max_queued_cost=INTENT_MAX_QUEUED_COST,
+            max_client_queued_cost=INTENT_MAX_CLIENT_QUEUED_COST,
+            weights={api_key_client(api_key): weight for api_key, weight in INTENT_CLIENT_WEIGHTS.items()},
+        )
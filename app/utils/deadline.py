@@ -0,0 +1,81 @@
+import threading
+import time
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when work is abandoned because its deadline passed or its client went away.
+
+    Attributes:
+    ----------
+    reason : str
+        Either 'timeout' or 'disconnected'.
+    """
+    def __init__(self, reason: str):
+        super().__init__(f"Request abandoned: {reason}")
+        self.reason = reason
+
+
+class Deadline:
+    """
+    Deadline and cancellation flag shared between a request and the services working on it.
+
+    Services call `check()` between units of work (batches, decoder steps) and stop as soon as it raises,
+    so abandoned requests stop consuming cores.
+
+    Attributes:
+    ----------
+    expires_at : float
+        `time.monotonic()` value after which the work is abandoned, or None for no time limit.
+    """
+    def __init__(self, timeout: float = None):
+        """
+        Initializes the Deadline instance.
+
+        Parameters:
+        ----------
+        timeout : float
+            Seconds from now until the deadline, or None for no time limit.
+        """
+        self.expires_at = time.monotonic() + timeout if timeout is not None else None
+        self._cancel_reason = None
+        self._cancelled = threading.Event()
+
+    def cancel(self, reason: str = 'disconnected'):
+        """
+        Cancels the work, for example because the client disconnected.
+        """
+        if not self._cancelled.is_set():
+            self._cancel_reason = reason
+            self._cancelled.set()
+
+    def remaining(self) -> float:
+        """
+        Returns the seconds left until the deadline, or None if there is no time limit.
+        """
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def reason(self) -> str:
+        """
+        Returns why the work should stop, or None if it may continue.
+        """
+        if self._cancelled.is_set():
+            return self._cancel_reason
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            return 'timeout'
+        return None
+
+    @property
+    def expired(self) -> bool:
+        return self.reason is not None
+
+    def check(self):
+        """
+        Raises DeadlineExceeded if the deadline passed or the work was cancelled.
+        """
+        reason = self.reason
+        if reason is not None:
+            raise DeadlineExceeded(reason)
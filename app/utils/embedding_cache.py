@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+
+
+class EmbeddingCache:
+    """
+    Thread-safe least-recently-used cache of sentence embeddings.
+
+    Keys are normalized sentences and values are embedding vectors. The cache belongs to a single loaded
+    encoder, so it has to be cleared whenever the encoder changes.
+
+    Attributes:
+    ----------
+    max_size : int
+        Maximum number of cached embeddings. A size of 0 disables the cache.
+    hits : int
+        Number of lookups answered from the cache.
+    misses : int
+        Number of lookups that had to be computed.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys: list) -> dict:
+        """
+        Returns the cached embeddings of the given keys, skipping keys that are not cached.
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                value = self._entries.get(key)
+                if value is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+                self.hits += 1
+        return found
+
+    def put_many(self, items: dict):
+        """
+        Stores several embeddings, evicting the least recently used entries when the cache is full.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,46 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_process_locks = {}
+_process_locks_guard = threading.Lock()
+
+
+def _process_lock(path: str) -> threading.Lock:
+    with _process_locks_guard:
+        return _process_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Holds an exclusive lock on `path` for the duration of the `with` block, across threads and processes.
+
+    The lock is an advisory `flock` on a lock file that is created if needed and never deleted. Every call opens
+    the file again, so threads of one process exclude each other as well. On platforms without `fcntl` a
+    per-path thread lock is used instead, which only covers the calling process.
+
+    Parameters:
+    ----------
+    path : str
+        Path of the lock file.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if fcntl is None:
+        with _process_lock(path):
+            yield
+        return
+
+    with open(path, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,39 @@
+import threading
+
+
+class Stats:
+    """
+    Process-wide counters and timings exposed by the `/stats` endpoint.
+    """
+    _counters = {}
+    _timings = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def increment(cls, name: str, amount: int = 1):
+        with cls._lock:
+            cls._counters[name] = cls._counters.get(name, 0) + amount
+
+    @classmethod
+    def observe(cls, name: str, seconds: float):
+        """
+        Records one duration, keeping its count, total and maximum.
+        """
+        with cls._lock:
+            count, total, longest = cls._timings.get(name, (0, 0.0, 0.0))
+            cls._timings[name] = (count + 1, total + seconds, max(longest, seconds))
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        with cls._lock:
+            timings = {
+                name: {'count': count, 'mean_seconds': total / count, 'max_seconds': longest, 'total_seconds': total}
+                for name, (count, total, longest) in cls._timings.items()
+            }
+            return {'counters': dict(cls._counters), 'timings': timings}
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._counters.clear()
+            cls._timings.clear()
@@ -0,0 +1,153 @@
+'''
+    Microbenchmark of the NER result path on entity-dense texts.
+
+    Compares the previous path (per-token pipeline dictionaries, word-by-word string concatenation and
+    `jsonable_encoder` + `json.dumps` serialization) against the current one (`aggregate_entities` over label
+    id arrays, `NERResponse` serialization and orjson rendering). The model forward pass is identical for both
+    paths and is left out, so the benchmark only needs the label table and synthetic predictions.
+
+    Usage:
+        python -m benchmarks.ner_aggregation --tokens 256 --iterations 2000
+'''
+
+import argparse
+import json
+import random
+import timeit
+import tracemalloc
+
+import numpy as np
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.schemas import NERResponse
+from app.services.ner_service import ENTITY_TYPES, aggregate_entities, build_label_table
+
+LABELS = ['O'] + [f"{prefix}-{entity_type}" for entity_type in ENTITY_TYPES for prefix in ('B', 'I')]
+WORDS = ['تهران', 'شرکت', 'ملی', 'نفت', 'ایران', 'علی', 'رضایی', 'دانشگاه', 'شریف', 'دلار', 'هزار', 'درصد', 'فروردین', 'ساعت', 'در', 'و', 'به']
+
+
+def make_sample(n_tokens: int, entity_ratio: float, seed: int = 0) -> tuple:
+    """
+    Builds a synthetic tokenized text where about `entity_ratio` of the tokens belong to entities.
+
+    Returns:
+    -------
+    tuple
+        The text, the label ids and offsets of the tokens (with [CLS] and [SEP]), and the word pieces.
+    """
+    rng = random.Random(seed)
+    label2id = {label: index for index, label in enumerate(LABELS)}
+    words, label_ids, offsets, pieces = [], [0], [(0, 0)], ['[CLS]']
+    position = 0
+    while len(label_ids) < n_tokens - 1:
+        in_entity = rng.random() < entity_ratio
+        entity_type = rng.choice(ENTITY_TYPES)
+        for word_index in range(rng.randint(1, 3) if in_entity else 1):
+            word = rng.choice(WORDS)
+            words.append(word)
+            # Split some words into two word pieces, as the WordPiece tokenizer does for rarer words
+            split = rng.randint(2, len(word) - 1) if len(word) > 3 and rng.random() < 0.3 else len(word)
+            for piece_start, piece_end in ((0, split), (split, len(word))):
+                if piece_start == piece_end:
+                    continue
+                if not in_entity:
+                    label = 'O'
+                elif word_index == 0 and piece_start == 0:
+                    label = f"B-{entity_type}"
+                else:
+                    label = f"I-{entity_type}"
+                label_ids.append(label2id[label])
+                offsets.append((position + piece_start, position + piece_end))
+                pieces.append(word[piece_start:piece_end] if piece_start == 0 else '##' + word[piece_start:piece_end])
+            position += len(word) + 1
+    label_ids.append(0)
+    offsets.append((0, 0))
+    pieces.append('[SEP]')
+    return ' '.join(words), np.array(label_ids), np.array(offsets), pieces
+
+
+def legacy_pipeline_output(label_ids: np.ndarray, offsets: np.ndarray, pieces: list) -> list:
+    """
+    Mirrors the per-token dictionaries the token classification pipeline used to build for every non-O token.
+    """
+    entities = []
+    for index, label_id in enumerate(label_ids.tolist()):
+        label = LABELS[label_id]
+        if label == 'O' or pieces[index] in ('[CLS]', '[SEP]'):
+            continue
+        start, end = offsets[index].tolist()
+        entities.append({'entity': label, 'score': np.float32(0.99), 'index': index, 'word': pieces[index], 'start': start, 'end': end})
+    return entities
+
+
+def legacy_group_entities(entities: list) -> dict:
+    """
+    The previous aggregation of `NERService.get_full_entity_names`.
+    """
+    entity_groups = {
+        'organization': [],
+        'money': [],
+        'location': [],
+        'person': [],
+        'time': [],
+        'date': [],
+        'percent': []
+    }
+
+    current_entity_words = None
+    current_entity_type = None
+
+    for entity in entities:
+        entity_label = entity['entity']
+        entity_type = entity_label.split('-')[1] if '-' in entity_label else None
+
+        if entity_type in entity_groups:
+            if 'B-' in entity_label:
+                if current_entity_words is not None:
+                    entity_groups[current_entity_type].append(current_entity_words.replace(' ##', '').strip())
+                current_entity_words = entity['word']
+                current_entity_type = entity_type
+            elif 'I-' in entity_label and current_entity_type == entity_type:
+                current_entity_words += ' ' + entity['word'].replace(' ##', '')
+
+    if current_entity_words is not None:
+        entity_groups[current_entity_type].append(current_entity_words.strip())
+
+    return entity_groups
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the NER aggregation and serialization path.")
+    parser.add_argument('--tokens', type=int, default=256, help="Tokens per text")
+    parser.add_argument('--entity-ratio', type=float, default=0.8, help="Share of tokens inside entities")
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    text, label_ids, offsets, pieces = make_sample(args.tokens, args.entity_ratio)
+    entity_types, begins = build_label_table(dict(enumerate(LABELS)))
+    adapter = TypeAdapter(NERResponse)
+
+    def legacy():
+        groups = legacy_group_entities(legacy_pipeline_output(label_ids, offsets, pieces))
+        return json.dumps(jsonable_encoder(groups), ensure_ascii=False).encode('utf-8')
+
+    def current():
+        groups = aggregate_entities(text, label_ids, offsets, entity_types, begins)
+        return orjson.dumps(adapter.dump_python(adapter.validate_python(groups), mode='json'))
+
+    print(f"{args.tokens} tokens per text, {args.entity_ratio:.0%} inside entities")
+    for name, run in (('legacy', legacy), ('current', current)):
+        seconds = min(timeit.repeat(run, number=args.iterations, repeat=5)) / args.iterations
+
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{name:>8}: {seconds * 1e6:8.1f} us/request, peak {peak / 1024:7.1f} KiB allocated")
+
+
+if __name__ == '__main__':
+    main()